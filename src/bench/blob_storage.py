@@ -0,0 +1,103 @@
+"""
+Benchmark SQLiteStorageClient upload/download throughput against the previous
+one-row-per-key layout.
+
+The workload uploads elements under distinct keys where most payloads repeat (the
+same report CSV or image attached to many threads), then downloads random keys with
+a skew towards recently uploaded ones. The legacy client is reproduced inline so both
+layouts run against the same workload.
+
+    python -m src.bench.blob_storage --uploads 2000 --distinct 50
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from src.db.sqlite_storage import SQLiteStorageClient
+
+
+class LegacyStorageClient:
+    """The blob_storage(object_key, data, mime_type) layout, one row per key, no cache."""
+
+    def __init__(self, database_path: str):
+        self.conn = sqlite3.connect(database_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS blob_storage (object_key TEXT PRIMARY KEY, data BLOB, mime_type TEXT)"
+        )
+        self.conn.commit()
+
+    def sync_upload_file(self, object_key: str, data: bytes, mime: str = "application/octet-stream") -> dict:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO blob_storage (object_key, data, mime_type) VALUES (?, ?, ?)",
+            (object_key, data, mime),
+        )
+        self.conn.commit()
+        return {"object_key": object_key}
+
+    def sync_download_file(self, object_key: str) -> bytes:
+        row = self.conn.execute("SELECT data FROM blob_storage WHERE object_key = ?", (object_key,)).fetchone()
+        return row[0] if row else ""
+
+
+def make_payloads(distinct: int, seed: int = 0) -> list[bytes]:
+    """Return payloads from 4 KiB to 1 MiB, mostly small like CSV exports and thumbnails."""
+    rng = random.Random(seed)
+    sizes = [rng.choice([4, 16, 64, 128, 256, 1024]) * 1024 for _ in range(distinct)]
+    return [rng.randbytes(size) for size in sizes]
+
+
+def run_client(client, db_path: str, payloads: list[bytes], uploads: int, downloads: int, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    keys = [f"thread-{i:06d}" for i in range(uploads)]
+    plan = [rng.choice(payloads) for _ in keys]
+
+    start = time.perf_counter()
+    for key, data in zip(keys, plan):
+        client.sync_upload_file(key, data, "text/csv")
+    upload_seconds = time.perf_counter() - start
+    upload_bytes = sum(len(data) for data in plan)
+
+    # Recent threads are read more often
+    reads = [keys[min(uploads - 1, int(rng.expovariate(1 / (uploads / 10))))] for _ in range(downloads)]
+    read_bytes = 0
+    start = time.perf_counter()
+    for key in reads:
+        read_bytes += len(client.sync_download_file(key))
+    download_seconds = time.perf_counter() - start
+
+    return {
+        "uploads_per_s": round(uploads / upload_seconds, 1),
+        "upload_mb_per_s": round(upload_bytes / 2**20 / upload_seconds, 1),
+        "downloads_per_s": round(downloads / download_seconds, 1),
+        "download_mb_per_s": round(read_bytes / 2**20 / download_seconds, 1),
+        "db_mb": round(os.path.getsize(db_path) / 2**20, 2),
+    }
+
+
+def run(uploads: int = 2000, distinct: int = 50, downloads: int = 5000) -> dict:
+    payloads = make_payloads(distinct)
+    results = {}
+    for name, factory in (("legacy", LegacyStorageClient), ("content_addressed", SQLiteStorageClient)):
+        db_path = os.path.join(tempfile.mkdtemp(), "blobs.db")
+        client = factory(db_path)
+        results[name] = run_client(client, db_path, payloads, uploads, downloads)
+        if isinstance(client, SQLiteStorageClient):
+            results[name]["cache"] = client.cache.stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark blob storage upload and download throughput")
+    parser.add_argument("--uploads", type=int, default=2000, help="Number of uploaded elements")
+    parser.add_argument("--distinct", type=int, default=50, help="Number of distinct payloads among the uploads")
+    parser.add_argument("--downloads", type=int, default=5000, help="Number of downloads")
+    args = parser.parse_args()
+    print(json.dumps(run(args.uploads, args.distinct, args.downloads), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark reader latency and consistency while a large import runs.
+
+A writer process imports synthetic findings for all scan types, either as an atomic
+snapshot (SnapshotBuilder) or by upserting each scan type into the live tables. The
+main process keeps querying the results view and reports query latency percentiles
+and the distinct finding counts it observed; an atomic import should only ever show
+the previous and the new snapshot.
+
+    python -m src.bench.ingest_readers --mode atomic --scale 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from src.bench.synthetic import make_aws_report, make_code_report, make_k8s_report
+from src.db.config import RESULTS_TABLE_SCHEMA
+from src.db.db_util import _delete_unused_rules, _upsert_normalized
+from src.db.snapshot import SnapshotBuilder
+from src.db.sqlite_functions import install_sqlite_functions, register_sqlite_functions
+from src.scan.aws import process_aws_scan
+from src.scan.kubernetes import process_k8s_scan
+from src.scan.filesystem import process_code_scan
+
+READER_QUERY = "SELECT type, severity, COUNT(*) FROM results GROUP BY type, severity"
+
+
+def synthetic_records(scale: int, seed: int = 0) -> dict:
+    """Return results records per scan type, built by the real report processors."""
+    def scored(df):
+        df["cvss_strings"] = "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:L/I:N/A:N"
+        df["risk_score"] = 5.3
+        return df.astype(object).to_dict(orient="records")
+
+    return {
+        "KUBERNETES": scored(process_k8s_scan(make_k8s_report(resources=2000 * scale, seed=seed),
+                                              exclude_metadata=False, grouping=False)),
+        "AWS": scored(process_aws_scan(make_aws_report(findings=5000 * scale, seed=seed))),
+        "CODE": asyncio.run(process_code_scan(make_code_report(vulnerabilities=20000 * scale, seed=seed)))
+                .astype(object).to_dict(orient="records"),
+    }
+
+
+def import_atomic(db_path: str, records: dict) -> None:
+    builder = SnapshotBuilder(db_path)
+    builder.begin()
+    try:
+        for rows in records.values():
+            builder.add(rows)
+        builder.publish()
+    finally:
+        builder.close()
+
+
+def import_upsert(db_path: str, records: dict) -> None:
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"timeout": 30})
+    install_sqlite_functions(engine)
+    # One transaction per scan type, as scan_import does in upsert mode
+    for rows in records.values():
+        with engine.begin() as conn:
+            _upsert_normalized(conn, rows)
+    with engine.begin() as conn:
+        _delete_unused_rules(conn)
+
+
+def _writer(db_path: str, mode: str, scale: int, ready, done) -> None:
+    records = synthetic_records(scale, seed=1)
+    ready.set()
+    start = time.perf_counter()
+    (import_atomic if mode == "atomic" else import_upsert)(db_path, records)
+    done.value = time.perf_counter() - start
+
+
+def run(mode: str = "atomic", scale: int = 1) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(RESULTS_TABLE_SCHEMA)
+    conn.close()
+    # Initial snapshot the readers start from
+    import_atomic(db_path, synthetic_records(scale, seed=0))
+
+    ctx = multiprocessing.get_context("spawn")
+    ready, done = ctx.Event(), ctx.Value("d", -1.0)
+    writer = ctx.Process(target=_writer, args=(db_path, mode, scale, ready, done))
+    writer.start()
+    ready.wait()
+
+    reader = sqlite3.connect(db_path, timeout=30)
+    register_sqlite_functions(reader)
+    latencies = []
+    observed = []
+    while writer.is_alive():
+        start = time.perf_counter()
+        rows = reader.execute(READER_QUERY).fetchall()
+        latencies.append(time.perf_counter() - start)
+        state = tuple(sorted((t, s, n) for t, s, n in rows))
+        if not observed or observed[-1] != state:
+            observed.append(state)
+    writer.join()
+    reader.close()
+
+    latencies.sort()
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+    return {
+        "mode": mode,
+        "import_seconds": round(done.value, 3),
+        "reader_queries": len(latencies),
+        "latency_ms": {
+            "p50": percentile(0.50), "p95": percentile(0.95), "p99": percentile(0.99),
+            "max": round(latencies[-1] * 1000, 2), "mean": round(statistics.mean(latencies) * 1000, 2),
+        },
+        "observed_states": len(observed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reader latency during an import")
+    parser.add_argument("--mode", choices=["atomic", "upsert", "both"], default="both")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier for the synthetic report sizes")
+    args = parser.parse_args()
+
+    modes = ["upsert", "atomic"] if args.mode == "both" else [args.mode]
+    print(json.dumps([run(mode, args.scale) for mode in modes], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Load-test the chat graph with concurrent simulated sessions.
+
+Each session sends a few turns (reports and questions) through graph.astream, as
+on_message does, and the driver reports end-to-end latency, time to the first
+streamed token and throughput. With --stub, a local stub LLM server
+(src.bench.stub_llm) is started and the app is pointed at it, and the results
+database is filled with synthetic findings, so no provider or scan is needed:
+
+    python -m src.bench.load_graph --stub --sessions 20 --turns 3
+
+LLM_RATE_LIMIT and LLM_MAX_CONCURRENCY still apply; raise them to measure the
+graph rather than the gateway limits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+DEFAULT_MESSAGES = [
+    "/report all",
+    "How many critical findings are there in AWS?",
+    "/report kubernetes",
+    "What is a privileged container and why is it risky?",
+    "Which resources have the highest risk score?",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_server(latency: float, token_rate: float) -> tuple:
+    """Start src.bench.stub_llm in a subprocess and wait until it accepts connections."""
+    port = _free_port()
+    process = subprocess.Popen([
+        sys.executable, "-m", "src.bench.stub_llm",
+        "--port", str(port), "--latency", str(latency), "--token-rate", str(token_rate),
+    ])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process, f"http://127.0.0.1:{port}/v1"
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Stub LLM server did not start")
+
+
+def prepare_database(db_path: str, scale: int) -> None:
+    """Create a results database with a synthetic findings snapshot."""
+    import sqlite3
+    from src.bench.ingest_readers import import_atomic, synthetic_records
+    from src.db.config import RESULTS_TABLE_SCHEMA
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript(RESULTS_TABLE_SCHEMA)
+    conn.close()
+    import_atomic(db_path, synthetic_records(scale))
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(p):
+        return round(values[min(len(values) - 1, int(p * len(values)))], 3)
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(values[-1], 3)}
+
+
+async def run_session(app, session: int, turns: int, messages: list[str], results: list) -> None:
+    from langchain_core.messages import HumanMessage
+    from langchain.schema.runnable.config import RunnableConfig
+
+    thread_id = f"load-{session}-{uuid.uuid4().hex[:8]}"
+    # Per-client LLM concurrency is accounted per chat thread, as in on_message
+    app.llm_client_id.set(thread_id)
+    for turn in range(turns):
+        content = messages[(session + turn) % len(messages)]
+        run_key = uuid.uuid4().hex
+        config = {"configurable": {"thread_id": thread_id, "run_key": run_key}}
+        start = time.perf_counter()
+        first_token = None
+        tokens = 0
+        error = None
+        try:
+            async for msg, metadata in app.graph.astream({"messages": [HumanMessage(content=content)]},
+                                                          stream_mode="messages",
+                                                          config=RunnableConfig(callbacks=[], **config)):
+                if msg.content and metadata["langgraph_node"] in app.REASONING_NODE and not isinstance(msg, HumanMessage):
+                    tokens += 1
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+        except Exception as e:
+            error = repr(e)
+        app.report_tables.pop(run_key)
+        results.append({
+            "kind": "report" if content.startswith("/report ") else "question",
+            "seconds": time.perf_counter() - start,
+            "first_token": first_token,
+            "tokens": tokens,
+            "error": error,
+        })
+
+
+async def run_load(app, sessions: int, turns: int, messages: list[str]) -> dict:
+    results: list = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(app, session, turns, messages, results) for session in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    def summarize(rows):
+        ok = [row for row in rows if row["error"] is None]
+        return {
+            "turns": len(rows),
+            "errors": len(rows) - len(ok),
+            "latency_s": percentiles([row["seconds"] for row in ok]),
+            "first_token_s": percentiles([row["first_token"] for row in ok if row["first_token"] is not None]),
+        }
+
+    summary = {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(results) / elapsed, 3),
+        "streamed_tokens_per_s": round(sum(row["tokens"] for row in results) / elapsed, 1),
+        "all": summarize(results),
+    }
+    for kind in ("report", "question"):
+        rows = [row for row in results if row["kind"] == kind]
+        if rows:
+            summary[kind] = summarize(rows)
+    errors = sorted({row["error"] for row in results if row["error"]})
+    if errors:
+        summary["error_samples"] = errors[:5]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the chat graph with concurrent sessions")
+    parser.add_argument("--sessions", type=int, default=10, help="Number of concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Messages per session")
+    parser.add_argument("--stub", action="store_true",
+                        help="Start a stub LLM server and use a synthetic results database")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub time to first token in seconds")
+    parser.add_argument("--token-rate", type=float, default=50, help="Stub tokens per second")
+    parser.add_argument("--scale", type=int, default=1, help="Size of the synthetic database with --stub")
+    parser.add_argument("--message", action="append", help="Message to send (repeatable), defaults to a mix")
+    args = parser.parse_args()
+
+    stub = None
+    if args.stub:
+        stub, base_url = start_stub_server(args.latency, args.token_rate)
+        os.environ["OPENAI_API_BASE"] = base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        # Per-role overrides would bypass the stub
+        for name in list(os.environ):
+            if name.startswith("LLM_") and name.endswith("_API_BASE"):
+                del os.environ[name]
+        # Set before anything reads DEFAULT_DB_PATH at import time
+        os.environ["DEFAULT_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "load.db")
+        prepare_database(os.environ["DEFAULT_DB_PATH"], args.scale)
+    try:
+        # Imported after the environment is set up, the app reads it at import time
+        from src.core import app
+        summary = asyncio.run(run_load(app, args.sessions, args.turns, args.message or DEFAULT_MESSAGES))
+        print(json.dumps(summary, indent=2))
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark each ingest and reporting stage separately on synthetic Trivy reports.
+
+Stages:
+    process.<type>   process_k8s_scan / process_aws_scan / process_code_scan
+    score.<type>     gen_k8s_score / gen_aws_score with a stub scoring model
+    upsert.<type>    batch_upsert_records into a fresh database
+    query_summary    query_summary for all categories
+    export_csv       export_to_csv
+
+Each stage reports wall time and peak traced memory. Results are printed as JSON and
+can be written to a file and compared against an earlier run:
+
+    python -m src.bench.pipeline --scale 2 --output bench.json
+    python -m src.bench.pipeline --scale 2 --compare bench.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from langchain_core.messages import AIMessage
+
+from src.bench.synthetic import make_reports
+from src.db import db_util
+from src.db.db_query import query_summary
+from src.db.sqlite_functions import register_sqlite_functions
+from src.scan import cvss_score
+from src.scan.aws import gen_aws_score, process_aws_scan
+from src.scan.filesystem import process_code_scan
+from src.scan.kubernetes import gen_k8s_score, process_k8s_scan
+from src.scan.scan_import import DB_COLS
+
+# A stage slower than the baseline by more than this factor is reported as a regression
+REGRESSION_THRESHOLD = 1.2
+
+
+class StubScoringModel:
+    """Stands in for the scoring model: answers every request with a fixed CVSS vector."""
+
+    def __init__(self, latency: float = 0.0, vector: str = "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:L/I:N/A:N"):
+        self.latency = latency
+        self.vector = vector
+        self.calls = 0
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return AIMessage(content=self.vector)
+
+
+async def measure(stage):
+    """
+    Await stage() once under tracemalloc.
+
+    Args:
+        stage (callable): Returns an awaitable whose result has a length (rows processed).
+
+    Returns:
+        tuple: (result, {"rows", "seconds", "peak_mb"})
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = await stage()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rows = len(result) if hasattr(result, "__len__") else result
+    return result, {"rows": rows, "seconds": round(seconds, 4), "peak_mb": round(peak / 2**20, 2)}
+
+
+async def _sync(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _records(df, scores=None) -> list[dict]:
+    if scores is not None:
+        df = df.merge(scores[["avdid", "cvss_strings", "risk_score"]], on="avdid", how="left")
+    return df[DB_COLS].astype(object).to_dict(orient="records")
+
+
+async def run(scale: int = 1, seed: int = 0, code_lines: int = 4, llm_latency: float = 0.0) -> dict:
+    # Round-trip through JSON so strings are distinct objects, as with a report read from disk
+    reports = json.loads(json.dumps(make_reports(scale, seed, code_lines)))
+    stages = {}
+
+    # Process the reports
+    frames = {}
+    frames["kubernetes"], stages["process.kubernetes"] = await measure(
+        lambda: _sync(process_k8s_scan, reports["kubernetes"], exclude_metadata=False, grouping=False))
+    frames["aws"], stages["process.aws"] = await measure(lambda: _sync(process_aws_scan, reports["aws"]))
+    frames["code"], stages["process.code"] = await measure(lambda: process_code_scan(reports["code"]))
+    frames["container"], stages["process.container"] = await measure(
+        lambda: process_code_scan(reports["container"], type="CONTAINER"))
+
+    # Score the misconfiguration rules; the catalog is emptied so every rule reaches the stub
+    stub = StubScoringModel(llm_latency)
+    model, catalog = cvss_score.model, cvss_score.CVSS_CATALOG
+    cvss_score.model, cvss_score.CVSS_CATALOG = stub, {}
+    try:
+        k8s_scores, stages["score.kubernetes"] = await measure(lambda: gen_k8s_score(frames["kubernetes"]))
+        aws_scores, stages["score.aws"] = await measure(lambda: gen_aws_score(frames["aws"]))
+    finally:
+        cvss_score.model, cvss_score.CVSS_CATALOG = model, catalog
+
+    records = {
+        "kubernetes": _records(frames["kubernetes"], k8s_scores),
+        "aws": _records(frames["aws"], aws_scores),
+        "code": _records(frames["code"]),
+        "container": _records(frames["container"]),
+    }
+
+    # Upsert into a fresh database through the module's async engine
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "bench.db")
+    db_util.DATABASE_URL = f"sqlite+aiosqlite:///{db_path}"
+    await db_util.init_db(db_path)
+    db_util.engine.sync_engine.echo = False
+    for scan_type, rows in records.items():
+        _, stages[f"upsert.{scan_type}"] = await measure(lambda: db_util.batch_upsert_records(rows))
+
+    conn = sqlite3.connect(db_path)
+    register_sqlite_functions(conn)
+    try:
+        _, stages["query_summary"] = await measure(lambda: _first(query_summary(conn, "all")))
+    finally:
+        conn.close()
+
+    csv_path = os.path.join(workdir, "export.csv")
+    _, stages["export_csv"] = await measure(lambda: _count_rows(db_util.export_to_csv(csv_path), csv_path))
+    await db_util.engine.dispose()
+
+    return {
+        "scale": scale,
+        "seed": seed,
+        "code_lines": code_lines,
+        "llm_latency": llm_latency,
+        "scoring_calls": stub.calls,
+        "db_mb": round(os.path.getsize(db_path) / 2**20, 2),
+        "stages": stages,
+    }
+
+
+async def _first(awaitable):
+    summary_df, details_df = await awaitable
+    return summary_df
+
+
+async def _count_rows(awaitable, csv_path):
+    await awaitable
+    with open(csv_path, "r", encoding="utf-8") as file:
+        return sum(1 for _ in file) - 1
+
+
+def compare(results: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    """
+    Compare stage times with a baseline run.
+
+    Args:
+        results (dict): Output of run().
+        baseline (dict): Output of an earlier run, ideally with the same scale and seed.
+        threshold (float): Time ratio above which a stage counts as a regression.
+
+    Returns:
+        list: Names of the regressed stages.
+    """
+    regressions = []
+    for name, stage in results["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before or not before["seconds"]:
+            continue
+        ratio = stage["seconds"] / before["seconds"]
+        mark = "REGRESSION" if ratio > threshold else ""
+        print(f"{name:<20} {before['seconds']:>9.3f}s -> {stage['seconds']:>9.3f}s  x{ratio:5.2f}  "
+              f"peak {before['peak_mb']:>8.1f} -> {stage['peak_mb']:>8.1f} MB  {mark}", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ingest and reporting stages")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier for the synthetic report sizes")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic reports")
+    parser.add_argument("--code-lines", type=int, default=4, help="Lines per CauseMetadata code snippet")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the stub scoring model waits per call")
+    parser.add_argument("--output", type=str, help="Also write the results to this file")
+    parser.add_argument("--compare", type=str, help="Baseline results file; exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Time ratio above which a stage counts as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.scale, args.seed, args.code_lines, args.llm_latency))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark DataFrame construction from Trivy reports.
+
+Runs process_code_scan, process_aws_scan and process_k8s_scan on synthetic reports
+and prints build time and peak traced memory.
+
+    python -m src.bench.report_build --scale 10
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+
+from src.bench.synthetic import make_aws_report, make_code_report, make_k8s_report
+from src.scan.aws import process_aws_scan
+from src.scan.filesystem import process_code_scan
+from src.scan.kubernetes import process_k8s_scan
+
+
+def measure(build, report) -> dict:
+    """
+    Run build(report) once under tracemalloc.
+
+    Args:
+        build (callable): Function returning a DataFrame.
+        report (dict): Report passed to build.
+
+    Returns:
+        dict: rows, seconds and peak_mb (peak allocation during the build, including the result).
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = build(report)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "rows": len(df),
+        "seconds": round(seconds, 4),
+        "peak_mb": round(peak / 2**20, 2),
+    }
+
+
+def run(scale: int = 1) -> dict:
+    # Round-trip through JSON so strings are distinct objects, as with a report read from disk
+    reports = {
+        "code": json.loads(json.dumps(make_code_report(vulnerabilities=20000 * scale))),
+        "aws": json.loads(json.dumps(make_aws_report(findings=5000 * scale))),
+        "kubernetes": json.loads(json.dumps(make_k8s_report(resources=1000 * scale))),
+    }
+    builders = {
+        "code": lambda report: asyncio.run(process_code_scan(report)),
+        "aws": process_aws_scan,
+        "kubernetes": lambda report: process_k8s_scan(report, exclude_metadata=False, grouping=False),
+    }
+    return {name: measure(builders[name], report) for name, report in reports.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report DataFrame construction")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier for the synthetic report sizes")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.scale)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        print(f"{name:<12} rows={result['rows']:<8} time={result['seconds']:.3f}s "
+              f"peak={result['peak_mb']:.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measure the import time of the app's entry points.
+
+Each module is imported in a fresh interpreter with -X importtime, so the result
+includes everything its import pulls in. scripts/startup_budget reports the slowest
+imports; tests/test_startup_budget.py enforces the budget and the deferred packages.
+"""
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import time budget of each module in milliseconds, as measured by -X importtime
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "4000"))
+# Checked modules, and the packages that must stay off their import path (loaded on first use)
+LLM_CLIENT_PACKAGES = ["langchain_openai", "langchain_nvidia_ai_endpoints", "openai"]
+DEFAULT_MODULES = {
+    "src.core.app": LLM_CLIENT_PACKAGES + ["pandas", "sqlalchemy", "sqlparse"],
+    # Imports work on dataframes and the ORM, only the scoring model is deferred
+    "src.scan.scan_import": LLM_CLIENT_PACKAGES,
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure_imports(module: str) -> list:
+    """
+    Import a module in a fresh interpreter with -X importtime.
+
+    Args:
+        module (str): Dotted module name
+
+    Returns:
+        list: (name, self_us, cumulative_us, depth) per imported module, in import order
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+    env.setdefault("OPENAI_API_KEY", "startup-budget")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def import_time_ms(module: str, imports: list) -> float:
+    """Return the cumulative import time of a module in milliseconds, from measure_imports output."""
+    return next((cumulative for name, _, cumulative, _ in imports if name == module), 0) / 1000
+
+
+def fastest_import(module: str, runs: int = 3) -> list:
+    """Import a module several times and return the fastest run; the first may include byte-compilation."""
+    return min((measure_imports(module) for _ in range(max(1, runs))), key=lambda run: import_time_ms(module, run))
+
+
+def forbidden_imports(imports: list, forbidden: list) -> list:
+    """Return the forbidden top-level packages that were imported."""
+    return sorted({name for name, _, _, _ in imports if name in forbidden})
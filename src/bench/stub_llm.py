@@ -0,0 +1,222 @@
+"""
+Local OpenAI-compatible chat completions server for offline load tests.
+
+Answers /v1/chat/completions, streaming and non-streaming, with deterministic canned
+responses chosen by prompt type: intent classification JSON, SQL, a CVSS vector or a
+narrative for everything else. Time to first token and token rate are configurable.
+Point the app at it with OPENAI_API_BASE:
+
+    python -m src.bench.stub_llm --port 8900 --latency 0.3 --token-rate 60
+    OPENAI_API_BASE=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub chainlit run src/core/app.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.responses import StreamingResponse
+
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.2"))  # seconds before the first token
+STUB_LLM_TOKEN_RATE = float(os.getenv("STUB_LLM_TOKEN_RATE", "50"))  # tokens per second, 0 for no delay
+STUB_LLM_NARRATIVE_TOKENS = int(os.getenv("STUB_LLM_NARRATIVE_TOKENS", "250"))
+
+# Prompt type, and a phrase of the prompt that identifies it
+PROMPT_MARKERS = [
+    ("intent", "how likely it is to retrieve relevant information"),
+    ("sql", "You are a SQL query generator"),
+    ("cvss", "calculate the CVSS Base Metrics"),
+]
+
+# Questions with these words are classified as answerable from the database
+DB_QUESTION_WORDS = ("top", "how many", "list", "which", "count", "show", "critical", "findings", "resources")
+
+STUB_SQL = "SELECT type, severity, COUNT(*) AS findings FROM results GROUP BY type, severity ORDER BY findings DESC"
+
+CVSS_VECTORS = [
+    "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H",
+    "CVSS:3.1/AV:N/AC:L/PR:L/UI:N/S:U/C:H/I:N/A:N",
+    "CVSS:3.1/AV:L/AC:L/PR:L/UI:N/S:U/C:L/I:L/A:N",
+    "CVSS:3.1/AV:N/AC:H/PR:N/UI:R/S:C/C:L/I:L/A:N",
+]
+
+NARRATIVE_SENTENCES = [
+    "The scan shows that most of the risk is concentrated in a small number of rules.",
+    "Privileged workloads and broad IAM permissions should be addressed first.",
+    "Several critical vulnerabilities have fixed versions available and can be patched directly.",
+    "Network exposure increases the impact of the misconfigurations found in the cluster.",
+    "Container images should be rebuilt from updated base images to remove outdated packages.",
+    "Enabling logging and encryption at rest closes a large share of the AWS findings.",
+    "Resource limits and read-only root filesystems reduce the blast radius of a compromise.",
+    "Tracking the trend of open findings across scans shows whether remediation keeps up.",
+]
+
+
+def classify_prompt(messages: list[dict]) -> str:
+    """Return the prompt type (intent, sql, cvss or narrative) of a chat completions request."""
+    text = "\n".join(_content(message) for message in messages)
+    for kind, marker in PROMPT_MARKERS:
+        if marker in text:
+            return kind
+    return "narrative"
+
+
+def _content(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        # Content parts
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def canned_response(kind: str, messages: list[dict], narrative_tokens: int = STUB_LLM_NARRATIVE_TOKENS) -> str:
+    """
+    Build the deterministic response to a request.
+
+    Args:
+        kind (str): Prompt type from classify_prompt.
+        messages (list): Request messages; the same messages always get the same response.
+        narrative_tokens (int): Approximate length of narrative responses in words.
+
+    Returns:
+        str: The response content.
+    """
+    last = _content(messages[-1]) if messages else ""
+    seed = int.from_bytes(hashlib.sha256(last.encode("utf-8")).digest()[:8], "big")
+    if kind == "intent":
+        question = last.split("Question:", 1)[-1].lower()
+        score = 90 if any(word in question for word in DB_QUESTION_WORDS) else 10
+        return json.dumps({"Score": score, "Reason": "Stub classification."})
+    if kind == "sql":
+        return STUB_SQL
+    if kind == "cvss":
+        return CVSS_VECTORS[seed % len(CVSS_VECTORS)]
+    rng = random.Random(seed)
+    words = []
+    while len(words) < narrative_tokens:
+        words.extend(rng.choice(NARRATIVE_SENTENCES).split())
+    return " ".join(words[:narrative_tokens])
+
+
+def _tokens(text: str) -> list[str]:
+    """Split text into stream chunks, one word (with its leading space) per token."""
+    words = text.split(" ")
+    return [words[0]] + [" " + word for word in words[1:]]
+
+
+def _usage(messages: list[dict], completion_tokens: int) -> dict:
+    prompt_tokens = sum(len(_content(message)) for message in messages) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0},
+    }
+
+
+def create_app(latency: float = STUB_LLM_LATENCY, token_rate: float = STUB_LLM_TOKEN_RATE,
+               narrative_tokens: int = STUB_LLM_NARRATIVE_TOKENS) -> FastAPI:
+    """
+    Create the stub server.
+
+    Args:
+        latency (float): Seconds before the first token.
+        token_rate (float): Tokens per second after the first one, 0 for no delay.
+        narrative_tokens (int): Approximate length of narrative responses in words.
+    """
+    app = FastAPI()
+    token_delay = 1 / token_rate if token_rate > 0 else 0.0
+    app.state.requests = {}
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.get("/v1/stats")
+    async def stats():
+        return app.state.requests
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "stub")
+        kind = classify_prompt(messages)
+        app.state.requests[kind] = app.state.requests.get(kind, 0) + 1
+        tokens = _tokens(canned_response(kind, messages, narrative_tokens))
+        usage = _usage(messages, len(tokens))
+        completion_id = f"chatcmpl-stub-{time.time_ns():x}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency + token_delay * (len(tokens) - 1))
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+            return "data: " + json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }) + "\n\n"
+
+        async def stream():
+            await asyncio.sleep(latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                if i and token_delay:
+                    await asyncio.sleep(token_delay)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            if include_usage:
+                yield "data: " + json.dumps({
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }) + "\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=STUB_LLM_LATENCY, help="Seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=STUB_LLM_TOKEN_RATE, help="Tokens per second, 0 for no delay")
+    parser.add_argument("--narrative-tokens", type=int, default=STUB_LLM_NARRATIVE_TOKENS,
+                        help="Approximate length of narrative responses in words")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.token_rate, args.narrative_tokens),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
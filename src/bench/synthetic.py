@@ -0,0 +1,246 @@
+import random
+
+from src.scan.cvss_vectorized import BASE_METRIC_WEIGHTS
+
+SEVERITIES = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+K8S_KINDS = ["Deployment", "DaemonSet", "StatefulSet", "Job", "CronJob", "Role", "ClusterRole"]
+AWS_SERVICES = ["s3", "ec2", "iam", "rds", "cloudtrail", "eks", "lambda", "sns", "sqs", "kms"]
+
+# Filler text so titles/descriptions are about as long as real Trivy output
+_FILLER = (
+    "Containers should be configured with the least privileges required to run. "
+    "Granting broader permissions increases the impact of a compromise and makes "
+    "lateral movement easier for an attacker who gains access to the workload."
+)
+
+
+def _random_vector(rng: random.Random) -> str:
+    return "CVSS:3.1" + "".join(
+        f"/{metric}:{rng.choice(list(values))}" for metric, values in BASE_METRIC_WEIGHTS.items()
+    )
+
+
+def _code(start_line: int, lines: int) -> dict:
+    return {"Lines": [{"Number": start_line + i, "Content": f"  field{i}: value"} for i in range(lines)]}
+
+
+def _rules(rng: random.Random, prefix: str, count: int) -> list[dict]:
+    return [
+        {
+            "ID": f"{prefix}{i:03d}",
+            "AVDID": f"AVD-{prefix}-{i:04d}",
+            "Title": f"Synthetic {prefix} rule {i}",
+            "Description": f"Rule {i}. {_FILLER}",
+            "Resolution": f"Apply remediation {i} to the affected resource.",
+            "Severity": rng.choice(SEVERITIES),
+        }
+        for i in range(count)
+    ]
+
+
+def make_k8s_report(resources: int = 1000, findings_per_resource: int = 5, rule_count: int = 60, seed: int = 0,
+                    code_lines: int = 4) -> dict:
+    """
+    Generate a Trivy Kubernetes report with the shape read by process_k8s_scan.
+
+    Args:
+        resources (int): Number of workload resources.
+        findings_per_resource (int): Misconfigurations per resource.
+        rule_count (int): Number of distinct rules findings are drawn from.
+        seed (int): Random seed, so runs are reproducible.
+        code_lines (int): Manifest lines in the CauseMetadata code snippet of each finding.
+
+    Returns:
+        dict: The report.
+    """
+    rng = random.Random(seed)
+    rules = _rules(rng, "KSV", rule_count)
+    report_resources = []
+    for r in range(resources):
+        kind = rng.choice(K8S_KINDS)
+        name = f"workload-{r}"
+        misconfigurations = []
+        for rule in rng.sample(rules, min(findings_per_resource, rule_count)):
+            line = rng.randint(1, 200)
+            misconfigurations.append({
+                **rule,
+                "Message": f"{kind} '{name}' violates {rule['ID']}",
+                "CauseMetadata": {
+                    "Provider": "Kubernetes",
+                    "Service": "general",
+                    "StartLine": line,
+                    "EndLine": line + max(code_lines - 1, 0),
+                    "Code": _code(line, code_lines),
+                },
+            })
+        report_resources.append({
+            "Namespace": f"ns-{r % 20}",
+            "Kind": kind,
+            "Name": name,
+            "Results": [{
+                "Target": f"{kind}/{name}",
+                "MisconfSummary": {"Successes": 0, "Failures": len(misconfigurations)},
+                "Misconfigurations": misconfigurations,
+            }],
+        })
+    return {"ClusterName": "synthetic", "Resources": report_resources}
+
+
+def make_aws_report(findings: int = 5000, rule_count: int = 120, seed: int = 0, code_lines: int = 0) -> dict:
+    """
+    Generate a Trivy AWS report with the shape read by process_aws_scan.
+
+    Args:
+        findings (int): Number of misconfigurations.
+        rule_count (int): Number of distinct rules findings are drawn from.
+        seed (int): Random seed, so runs are reproducible.
+        code_lines (int): Lines in the CauseMetadata code snippet of each finding (0 for none,
+            as for findings from the live AWS API).
+
+    Returns:
+        dict: The report.
+    """
+    rng = random.Random(seed)
+    rules = _rules(rng, "AWS", rule_count)
+    results = {}
+    for i in range(findings):
+        service = rng.choice(AWS_SERVICES)
+        rule = rng.choice(rules)
+        cause_metadata = {
+            "Provider": "AWS",
+            "Service": service,
+            "Resource": f"arn:aws:{service}:us-west-2:123456789012:resource/{i}",
+        }
+        if code_lines:
+            cause_metadata["Code"] = _code(1, code_lines)
+        results.setdefault(service, []).append({
+            **rule,
+            "Message": f"Resource {i} is not compliant",
+            "CauseMetadata": cause_metadata,
+        })
+    return {
+        "Results": [
+            {"Target": f"arn:aws:{service}", "Class": "config", "Misconfigurations": misconfigurations}
+            for service, misconfigurations in results.items()
+        ]
+    }
+
+
+def _cves(rng: random.Random, count: int, year: int = 2024) -> list[dict]:
+    return [
+        {
+            "VulnerabilityID": f"CVE-{year}-{10000 + i}",
+            "Title": f"Synthetic vulnerability {i}",
+            "Description": f"Vulnerability {i}. {_FILLER}",
+            "Severity": rng.choice(SEVERITIES),
+            "CVSS": {"nvd": {"V3Vector": _random_vector(rng), "V3Score": round(rng.uniform(1, 10), 1)}},
+        }
+        for i in range(count)
+    ]
+
+
+def make_code_report(vulnerabilities: int = 20000, packages: int = 400, targets: int = 10,
+                     cve_count: int = 2000, seed: int = 0, vulns_per_package: int = None) -> dict:
+    """
+    Generate a Trivy filesystem report with the shape read by process_code_scan.
+
+    Args:
+        vulnerabilities (int): Number of vulnerabilities.
+        packages (int): Number of distinct packages.
+        targets (int): Number of scan targets (lock files).
+        cve_count (int): Number of distinct CVEs vulnerabilities are drawn from.
+        seed (int): Random seed, so runs are reproducible.
+        vulns_per_package (int, optional): If set, overrides vulnerabilities with packages * vulns_per_package.
+
+    Returns:
+        dict: The report.
+    """
+    rng = random.Random(seed)
+    if vulns_per_package is not None:
+        vulnerabilities = packages * vulns_per_package
+    cves = _cves(rng, cve_count)
+    results = [{"Target": f"app{t}/package-lock.json", "Class": "lang-pkgs", "Vulnerabilities": []} for t in range(targets)]
+    for i in range(vulnerabilities):
+        pkg = rng.randrange(packages)
+        results[i % targets]["Vulnerabilities"].append({
+            **rng.choice(cves),
+            "PkgID": f"pkg{pkg}@1.{pkg % 10}.0",
+            "PkgName": f"pkg{pkg}",
+            "PkgIdentifier": {"PURL": f"pkg:npm/pkg{pkg}@1.{pkg % 10}.0"},
+            "InstalledVersion": f"1.{pkg % 10}.0",
+            "FixedVersion": f"1.{pkg % 10}.1",
+        })
+    return {"SchemaVersion": 2, "ArtifactType": "filesystem", "Results": results}
+
+
+def make_image_report(packages: int = 300, vulns_per_package: int = 4, cve_count: int = 1500,
+                      layers: int = 5, seed: int = 0) -> dict:
+    """
+    Generate a Trivy container image report with the shape read by process_code_scan
+    and get_image_summary: OS packages spread over the image layers.
+
+    Args:
+        packages (int): Number of distinct OS packages with vulnerabilities.
+        vulns_per_package (int): Vulnerabilities per package.
+        cve_count (int): Number of distinct CVEs vulnerabilities are drawn from.
+        layers (int): Number of image layers packages are installed in.
+        seed (int): Random seed, so runs are reproducible.
+
+    Returns:
+        dict: The report.
+    """
+    rng = random.Random(seed)
+    cves = _cves(rng, cve_count, year=2023)
+    diff_ids = [f"sha256:{rng.getrandbits(256):064x}" for _ in range(layers)]
+    artifact = "synthetic/app:latest"
+    vulnerabilities = []
+    for pkg in range(packages):
+        version = f"{pkg % 7}.{pkg % 13}.{pkg % 5}-1"
+        layer = diff_ids[pkg % layers]
+        for cve in rng.sample(cves, min(vulns_per_package, cve_count)):
+            vulnerabilities.append({
+                **cve,
+                "PkgID": f"lib{pkg}@{version}",
+                "PkgName": f"lib{pkg}",
+                "PkgIdentifier": {"PURL": f"pkg:deb/debian/lib{pkg}@{version}?arch=amd64&distro=debian-12.5"},
+                "InstalledVersion": version,
+                "FixedVersion": f"{pkg % 7}.{pkg % 13}.{pkg % 5}-2",
+                "Layer": {"DiffID": layer},
+            })
+    return {
+        "SchemaVersion": 2,
+        "CreatedAt": "2025-01-01T00:00:00Z",
+        "ArtifactName": artifact,
+        "ArtifactType": "container_image",
+        "Metadata": {
+            "OS": {"Family": "debian", "Name": "12.5"},
+            "ImageID": f"sha256:{rng.getrandbits(256):064x}",
+            "DiffIDs": diff_ids,
+        },
+        "Results": [{
+            "Target": f"{artifact} (debian 12.5)",
+            "Class": "os-pkgs",
+            "Type": "debian",
+            "Vulnerabilities": vulnerabilities,
+        }],
+    }
+
+
+def make_reports(scale: int = 1, seed: int = 0, code_lines: int = 4) -> dict:
+    """
+    Generate one report of each scan type, sized relative to a mid-sized cluster and account.
+
+    Args:
+        scale (int): Multiplier for resources, findings, vulnerabilities and packages.
+        seed (int): Random seed, so runs are reproducible.
+        code_lines (int): Lines in each CauseMetadata code snippet of the k8s report.
+
+    Returns:
+        dict: "kubernetes", "aws", "code" and "container" reports.
+    """
+    return {
+        "kubernetes": make_k8s_report(resources=1000 * scale, seed=seed, code_lines=code_lines),
+        "aws": make_aws_report(findings=5000 * scale, seed=seed),
+        "code": make_code_report(vulnerabilities=20000 * scale, seed=seed),
+        "container": make_image_report(packages=300 * scale, seed=seed),
+    }
@@ -1,36 +1,35 @@
-from io import StringIO
+import asyncio
 import json
 import os
 from typing import Dict, Literal, Optional
-import pandas as pd
 import sqlite3
 
 # LangChain imports
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import PromptTemplate
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 from langgraph.graph import StateGraph, END, START
 from langgraph.types import Command
 from langgraph.graph.message import MessagesState
-from langgraph.checkpoint.memory import MemorySaver
 from langchain.schema.runnable.config import RunnableConfig
 
 # Chainlit imports
 import chainlit as cl
-import chainlit.data as cl_data
-from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
 
 # Local imports
-from src.utils.utils import token_count, read_prompt, read_file_prompt, messages_token_count, load_chat_model, get_latest_human_message, reasoning_prompt, trim_messages_to_max_tokens
-from src.db.db_query import generate_query, is_valid_query, query_summary
+from src.utils.utils import token_count, read_prompt, read_file_prompt, messages_token_count, get_chat_model, get_latest_human_message, reasoning_prompt, trim_messages_to_max_tokens, static_prompt, prompt_template, preload_encodings, log_cache_usage
+from src.utils.cache import TTLObjectCache
+from src.utils.streaming import TokenStreamBuffer
+from src.utils.llm_gateway import llm_client_id
+from src.utils.metrics import instrument_node, render_metrics, DB_QUERY_SECONDS
+from src.utils.profiling import profile_run, strip_profile_prefix
+from src.utils.warmup import READINESS, install_warmup, open_llm_connection, open_warmup_connection, touch_indexes
+from src.db.db_query import generate_query, is_valid_query, query_summary, query_trend
 
 # Custom API
 from fastapi import FastAPI, HTTPException, Request, Response, APIRouter
-from starlette.responses import StreamingResponse
+from starlette.responses import JSONResponse, StreamingResponse
 from chainlit.server import app
 from starlette.routing import BaseRoute, Route
 
-checkpointer=MemorySaver()
-
 #-------------------------------
 # System Constants
 #-------------------------------
@@ -38,17 +37,34 @@ SYSTEM_PROMPT = read_file_prompt("./src/prompts/report_system_prompt.txt")
 
 VALID_REPORT_CATEGORIES = {"code", "container", "aws", "kubernetes", "all"}
 
+# Template variables of the node prompts in ./src/prompts/<node>_prompt.txt
+NODE_PROMPTS = {
+    "summary": ("category", "summary", "trend", "result"),
+    "insight": ("result",),
+    "explanation": ("question", "sql_query", "scan_results"),
+}
+
+# Report tables handed from the summary node to the UI, keyed by run
+report_tables = TTLObjectCache()
+
 #-------------------------------
 # Database Configuration
 #-------------------------------
 from src.db.db_setup import setup_database_connections
+from src.db.sqlite_storage import parse_byte_range
+from src.db.checkpoint import SQLiteCheckpointSaver
 
+# Connections are opened on first use
 app_context = setup_database_connections()
+checkpointer = SQLiteCheckpointSaver(app_context.db_path)
 #-------------------------------
 # Model setup
 #-------------------------------
-model = load_chat_model()
-final_model = load_chat_model().with_config(tags=["final_node"])
+# Short, hot calls (intent, sql) can use a small fast model, see get_model_config().
+# Models are created on first use by get_chat_model().
+def final_model():
+    """The report model, tagged so that its tokens are streamed to the UI."""
+    return get_chat_model("report").with_config(tags=["final_node"])
 
 #-------------------------------
 # Chainlit Authentication
@@ -70,8 +86,9 @@ class AgentState(MessagesState):
     category: Optional[str] = None
     result_text: Optional[str] = None
     top5: Optional[str] = None
-    dataframe: Optional[str] = None
 
+# Large per-run fields that should not outlive the run in the checkpoint store
+TRANSIENT_STATE_FIELDS = ["sql_query", "query_results", "result_text", "top5"]
 
 
 
@@ -102,6 +119,10 @@ def parse_report_command(input_string: str) -> str:
         
     return argument
 
+def node_prompt(node: str):
+    """Return the compiled prompt template of a node"""
+    return prompt_template(f"./src/prompts/{node}_prompt.txt", NODE_PROMPTS[node])
+
 #-------------------------------
 # Node Functions
 #-------------------------------
@@ -121,12 +142,16 @@ async def classify_user_intent(state: AgentState):
             goto="summary"
         )
     except ValueError:
-        # Process as a regular question
+        # Process as a regular question, static instructions first and the question last
         content = reasoning_prompt(
-            "./src/prompts/intent_classification_prompt.txt", 
+            "./src/prompts/intent_question_prompt.txt", 
             question=query
         )
-        intent_response = await model.ainvoke([HumanMessage(content=content)])
+        intent_response = await get_chat_model("intent").ainvoke([
+            SystemMessage(content=static_prompt("./src/prompts/intent_classification_prompt.txt")),
+            HumanMessage(content=content)
+        ])
+        log_cache_usage("intent", intent_response)
         
         try:
             res = json.loads(intent_response.content)
@@ -152,32 +177,32 @@ async def classify_user_intent(state: AgentState):
         
 async def invoke_llm(state: AgentState):
     messages = state["messages"]
-    response = await model.ainvoke(messages)
+    response = await get_chat_model("report").ainvoke(messages)
+    log_cache_usage("report", response)
     # We return a list, because this will get added to the existing list
     return {"messages": [response]}
 
-async def generate_summary_report(state: AgentState):
+async def generate_summary_report(state: AgentState, config: RunnableConfig):
     """Generate a summary report based on the specified category"""
     print("--------------do_summary---------------")
     category = state["category"]
 
     # Query database for summary data
     summary_df, details_df = await query_summary(app_context.get_connection(), category)
+    trend_df = await query_trend(app_context.get_connection(), category)
     
     # Convert results to string format
     result = details_df.to_string(index=False)
     top5_result = details_df.to_string()
     summary = summary_df.to_string(index=False)
+    trend = trend_df.to_string(index=False) if trend_df is not None and not trend_df.empty else "No scan history recorded."
 
     # Format prompt for the model
-    template = read_prompt("summary")
-    prompt = PromptTemplate(
-        template=template,
-        input_variables=["category", "summary", "result"]
-    )
+    prompt = node_prompt("summary")
     formatted_prompt = prompt.format(
         category=category, 
         summary=summary, 
+        trend=trend,
         result=result
     )
     
@@ -192,12 +217,13 @@ async def generate_summary_report(state: AgentState):
     print(f"Token used: {tokens}\n")
 
     # Get response from the model
-    response = await final_model.ainvoke(messages)
+    response = await final_model().ainvoke(messages)
+    log_cache_usage("summary", response)
 
-    # Store results in state
-    df_str = details_df.to_csv(index=False)
+    # Hand the table to the UI directly, the state only keeps the text forms
+    configurable = config.get("configurable", {})
+    report_tables.put(configurable.get("run_key", configurable.get("thread_id")), details_df)
     return {
-        "dataframe": df_str, 
         "result_text": result, 
         "top5": top5_result, 
         "messages": [response]
@@ -209,11 +235,7 @@ async def generate_insights(state: AgentState):
     result = state["top5"]
 
     # Format prompt for insights
-    template = read_prompt("insight")
-    prompt = PromptTemplate(
-        template=template,
-        input_variables=["result"]
-    )
+    prompt = node_prompt("insight")
     formatted_prompt = prompt.format(result=result)
     
     # Create messages for the model
@@ -223,7 +245,8 @@ async def generate_insights(state: AgentState):
     ]
     
     # Get response from the model
-    response = await final_model.ainvoke(messages)
+    response = await final_model().ainvoke(messages)
+    log_cache_usage("insight", response)
 
     return {"messages": [response]}
 
@@ -242,7 +265,8 @@ async def finalize_conclusion(state: AgentState):
     print(f"total message tokens: {total_tokens}")
     
     # Get response from the model
-    response = await final_model.ainvoke(messages)
+    response = await final_model().ainvoke(messages)
+    log_cache_usage("conclude", response)
     
     return {"messages": [HumanMessage(content=result), response]}
 
@@ -258,7 +282,7 @@ async def execute_db_query(state: AgentState) -> Command[Literal["reason"]]:
 
     try:
         # Generate a database query using the model
-        generated_query = await generate_query(user_query, category, model)
+        generated_query = await generate_query(user_query, category, get_chat_model("sql"))
 
         # Validate the generated query
         if not is_valid_query(generated_query, app_context.get_engine()):
@@ -271,8 +295,9 @@ async def execute_db_query(state: AgentState) -> Command[Literal["reason"]]:
         # Execute the validated query
         print("Executing query...\n\n")
         cursor = app_context.get_connection().cursor()
-        cursor.execute(generated_query)
-        records = cursor.fetchall()
+        with DB_QUERY_SECONDS.time(query="generated"):
+            cursor.execute(generated_query)
+            records = cursor.fetchall()
 
         # Prepare query results
         if records:
@@ -314,11 +339,7 @@ async def provide_explanation(state: AgentState):
             user_query = get_latest_human_message(state["messages"])
 
         # Format the explanation prompt
-        template = read_prompt("explanation")
-        prompt = PromptTemplate(
-            template=template,
-            input_variables=["question", "sql_query", "scan_results"]
-        )
+        prompt = node_prompt("explanation")
         formatted_prompt = prompt.format(
             question=user_query, 
             sql_query=sql_query, 
@@ -332,7 +353,8 @@ async def provide_explanation(state: AgentState):
         messages.append(HumanMessage(content=formatted_prompt))
         messages = trim_messages_to_max_tokens(messages)
         # Get response from the model
-        explanation_response = await model.ainvoke(messages)
+        explanation_response = await get_chat_model("explanation").ainvoke(messages)
+        log_cache_usage("explanation", explanation_response)
         
         # Clear state for next interaction
         return Command(
@@ -358,19 +380,24 @@ async def provide_explanation(state: AgentState):
         )
 
 
+async def cleanup_state(state: AgentState):
+    """Drop large transient fields before the final checkpoint of the run is stored"""
+    return {field: None for field in TRANSIENT_STATE_FIELDS}
+
 #-------------------------------
 # Graph node
 #-------------------------------
 
 builder = StateGraph(AgentState)
 
-builder.add_node("intent", classify_user_intent)
-builder.add_node("querydb", execute_db_query)
-builder.add_node("summary", generate_summary_report)
-builder.add_node("insight", generate_insights)
-builder.add_node("conclude", finalize_conclusion)
-builder.add_node("reason", provide_explanation)
-builder.add_node("report", invoke_llm)
+builder.add_node("intent", instrument_node("intent", classify_user_intent))
+builder.add_node("querydb", instrument_node("querydb", execute_db_query))
+builder.add_node("summary", instrument_node("summary", generate_summary_report))
+builder.add_node("insight", instrument_node("insight", generate_insights))
+builder.add_node("conclude", instrument_node("conclude", finalize_conclusion))
+builder.add_node("reason", instrument_node("reason", provide_explanation))
+builder.add_node("report", instrument_node("report", invoke_llm))
+builder.add_node("cleanup", instrument_node("cleanup", cleanup_state))
 
 # define the node which will display the resoning result on web
 REASONING_NODE = ["reason", "report", "summary", "insight", "assessment", "remediation", "effort", "conclude"]
@@ -379,8 +406,9 @@ builder.add_edge(START, "intent")
 builder.add_edge("summary", "insight")
 builder.add_edge("insight", "conclude")
 builder.add_edge("querydb", "reason")
-builder.add_edge("conclude", END)
-builder.add_edge("reason", END)
+builder.add_edge("conclude", "cleanup")
+builder.add_edge("reason", "cleanup")
+builder.add_edge("cleanup", END)
 
 graph = builder.compile(
 checkpointer=checkpointer
@@ -393,45 +421,67 @@ checkpointer=checkpointer
 @cl.on_chat_start
 async def on_chat_start():
     cl.user_session.set("chat_history",[])
+    cl.user_session.set("stream_stats", {"tokens": 0, "emits": 0, "runs": 0})
 
 @cl.on_message
 async def on_message(msg: cl.Message):
+    # "/profile <message>" profiles this run only, PROFILE_ENABLED profiles every run
+    content, profile = strip_profile_prefix(msg.content)
     chat_history = cl.user_session.get("chat_history")
-    chat_history.append({"role": "user", "content": msg.content})
-    config = {"configurable": {"thread_id": msg.thread_id}}
+    chat_history.append({"role": "user", "content": content})
+    config = {"configurable": {"thread_id": msg.thread_id, "run_key": msg.id}}
+    # Per-client LLM concurrency is accounted per chat thread
+    llm_client_id.set(msg.thread_id)
 
     cb = cl.LangchainCallbackHandler()
     final_answer = cl.Message(content="")
+    stream_buffer = TokenStreamBuffer(final_answer)
+    current_node = None
     
-    async for msg, metadata in graph.astream({"messages": [HumanMessage(content=msg.content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[], **config)):
-        if (
-            msg.content
-            and not isinstance(msg, HumanMessage)
-            and not isinstance(msg, SystemMessage)
-            and metadata["langgraph_node"] in REASONING_NODE
-        ):
-            await final_answer.stream_token(msg.content)
-
-        if (
-            "finish_reason" in msg.response_metadata
-            and msg.response_metadata["finish_reason"] == "stop"
-        ):
-            await final_answer.stream_token("\n\n")
-
-        # Hack print report by dataframe
-        if (
-            "finish_reason" in msg.response_metadata
-            and msg.response_metadata["finish_reason"] == "stop"
-            and metadata["langgraph_node"] in ["insight"]
-        ):
-            state = graph.get_state(config=config)
-            df_str = state.values["dataframe"]
-            df = pd.read_csv(StringIO(df_str))
-            elements = [cl.Dataframe(data=df, display="inline", name="Dataframe")]
-            await cl.Message(content="Report Table:", elements=elements).send()
-
+    with profile_run("report" if content.startswith("/report ") else "question", enabled=profile or None):
+        async for msg, metadata in graph.astream({"messages": [HumanMessage(content=content)]}, stream_mode="messages", config=RunnableConfig(callbacks=[], **config)):
+            # Never mix the output of two nodes in one emit
+            if metadata["langgraph_node"] != current_node:
+                await stream_buffer.flush()
+                current_node = metadata["langgraph_node"]
+
+            if (
+                msg.content
+                and not isinstance(msg, HumanMessage)
+                and not isinstance(msg, SystemMessage)
+                and metadata["langgraph_node"] in REASONING_NODE
+            ):
+                await stream_buffer.add(msg.content)
+
+            if (
+                "finish_reason" in msg.response_metadata
+                and msg.response_metadata["finish_reason"] == "stop"
+            ):
+                await stream_buffer.add("\n\n")
+                await stream_buffer.flush()
+
+            # Hack print report by dataframe
+            if (
+                "finish_reason" in msg.response_metadata
+                and msg.response_metadata["finish_reason"] == "stop"
+                and metadata["langgraph_node"] in ["insight"]
+            ):
+                df = report_tables.pop(config["configurable"]["run_key"])
+                if df is not None:
+                    elements = [cl.Dataframe(data=df, display="inline", name="Dataframe")]
+                    await cl.Message(content="Report Table:", elements=elements).send()
+
+    await stream_buffer.flush()
     await final_answer.send()
 
+    # Per-session emit counters, used to tune the flush window and size
+    stream_stats = cl.user_session.get("stream_stats") or {"tokens": 0, "emits": 0, "runs": 0}
+    run_stats = stream_buffer.stats()
+    stream_stats["tokens"] += run_stats["tokens"]
+    stream_stats["emits"] += run_stats["emits"]
+    stream_stats["runs"] += 1
+    cl.user_session.set("stream_stats", stream_stats)
+
 @cl.set_starters
 async def set_starters():
     return [
@@ -491,17 +541,100 @@ async def on_chat_resume(thread):
 
 
 
+#-------------------------------
+# Warm-up
+#-------------------------------
+def compile_prompts():
+    """Read and compile the prompts used by the graph nodes"""
+    for node in NODE_PROMPTS:
+        node_prompt(node)
+    prompt_template("./src/prompts/intent_question_prompt.txt", ("question",))
+    prompt_template("./src/prompts/db_query_question_prompt.txt", ("QUESTION", "category"))
+    static_prompt("./src/prompts/intent_classification_prompt.txt")
+    static_prompt("./src/prompts/db_query_prompt.txt")
+
+def warm_database():
+    """Read the results indexes and summary tables"""
+    # Runs in a worker thread with a connection of its own, so the reads do not
+    # block requests served while warming up
+    conn = open_warmup_connection(app_context.db_path)
+    try:
+        touch_indexes(conn)
+        asyncio.run(query_summary(conn, "all"))
+        asyncio.run(query_trend(conn, "all"))
+    finally:
+        conn.close()
+
+async def open_database_connections():
+    """Open the app's database connections"""
+    # Runs on the event loop, the connection is bound to the thread that opens it
+    if app_context.get_connection() is None:
+        raise RuntimeError(f"Database not available: {app_context.db_path}")
+    app_context.get_engine()
+    app_context.storage_client
+    checkpointer.conn
+
+async def open_llm_connections():
+    """Open a pooled connection to the endpoint of each chat model"""
+    await asyncio.gather(*(open_llm_connection(get_chat_model(role)) for role in ("intent", "sql", "explanation", "report")))
+
+install_warmup(app, {
+    "tiktoken": preload_encodings,
+    "prompts": compile_prompts,
+    "database_connections": open_database_connections,
+    "database": warm_database,
+    "llm_connections": open_llm_connections,
+})
+
 cust_router = APIRouter()
 
 @cust_router.get("/blob/{object_key}")
 async def serve_blob_file(
-    object_key: str
+    object_key: str,
+    request: Request
 ):
     if app_context.storage_client is None:
         raise HTTPException(status_code=500, detail="Storage client not initialized")
-    file_data = await app_context.storage_client.download_file(object_key)
-    
-    return Response(content=file_data, media_type="application/octet-stream")
+    storage_client = app_context.storage_client
+    info = await storage_client.blob_info(object_key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    headers = {"ETag": info.etag, "Accept-Ranges": "bytes"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or info.etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        byte_range = parse_byte_range(request.headers.get("range"), info.size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{info.size}"})
+
+    # Stream the blob in chunks instead of loading it into memory
+    if byte_range is None:
+        start, end, status_code = 0, info.size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        storage_client.iter_blob(info, start, end),
+        status_code=status_code,
+        media_type=info.mime_type,
+        headers=headers,
+    )
+
+@cust_router.get("/ready")
+async def serve_ready():
+    # 503 until the warm-up has finished, for load balancer health checks
+    status = READINESS.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@cust_router.get("/metrics")
+async def serve_metrics():
+    # Prometheus text exposition format
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 serve_route: list[BaseRoute] = [
     r for r in app.router.routes if isinstance(r, Route) and r.name == "serve"
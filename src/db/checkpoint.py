@@ -0,0 +1,393 @@
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from src.db.config import (
+    DEFAULT_DB_PATH,
+    CHECKPOINT_KEEP_PER_THREAD,
+    CHECKPOINT_MAX_AGE_DAYS,
+    CHECKPOINT_MAX_THREADS,
+    CHECKPOINT_SWEEP_INTERVAL,
+)
+
+CHECKPOINT_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    "thread_id" TEXT NOT NULL,
+    "checkpoint_ns" TEXT NOT NULL DEFAULT '',
+    "checkpoint_id" TEXT NOT NULL,
+    "parent_checkpoint_id" TEXT,
+    "type" TEXT,
+    "checkpoint" BLOB,
+    "metadata" BLOB,
+    "created_at" REAL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at ON checkpoints (created_at);
+
+CREATE TABLE IF NOT EXISTS checkpoint_writes (
+    "thread_id" TEXT NOT NULL,
+    "checkpoint_ns" TEXT NOT NULL DEFAULT '',
+    "checkpoint_id" TEXT NOT NULL,
+    "task_id" TEXT NOT NULL,
+    "idx" INTEGER NOT NULL,
+    "channel" TEXT NOT NULL,
+    "type" TEXT,
+    "value" BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver backed by the application SQLite database.
+
+    Checkpoints are serialized with the configured serde and zlib-compressed.
+    Only the newest ``keep_per_thread`` checkpoints of a thread are kept, and
+    threads idle for longer than ``max_age_days`` (or beyond ``max_threads``)
+    are removed by a periodic sweep. The database is opened on first use.
+    """
+
+    def __init__(
+        self,
+        database_path: str = DEFAULT_DB_PATH,
+        keep_per_thread: int = CHECKPOINT_KEEP_PER_THREAD,
+        max_age_days: float = CHECKPOINT_MAX_AGE_DAYS,
+        max_threads: int = CHECKPOINT_MAX_THREADS,
+        sweep_interval: int = CHECKPOINT_SWEEP_INTERVAL,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.database_path = database_path
+        self.keep_per_thread = max(1, keep_per_thread)
+        self.max_age_days = max_age_days
+        self.max_threads = max_threads
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._connect_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._connect_lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.database_path, check_same_thread=False)
+                    conn.execute("PRAGMA busy_timeout = 5000")
+                    conn.executescript(CHECKPOINT_TABLE_SCHEMA)
+                    conn.commit()
+                    self._conn = conn
+        return self._conn
+
+    #-------------------------------
+    # Serialization
+    #-------------------------------
+    def _dumps(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        return type_, zlib.compress(data)
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        return self.serde.loads_typed((type_, zlib.decompress(data)))
+
+    def _compact_metadata(self, metadata: CheckpointMetadata) -> dict:
+        # "writes" duplicates every node output (dataframes, reports) already in the checkpoint
+        return {k: v for k, v in metadata.items() if k != "writes"}
+
+    #-------------------------------
+    # Sync API
+    #-------------------------------
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._lock:
+            if checkpoint_id:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            writes = self.conn.execute(
+                "SELECT task_id, channel, type, value FROM checkpoint_writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, row[0]),
+            ).fetchall()
+        return self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row, writes) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self._loads(type_, checkpoint),
+            metadata=self._loads(type_, metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self._loads(w_type, value))
+                for task_id, channel, w_type, value in writes
+            ],
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata "
+                f"FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[2], row[4])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            with self._lock:
+                writes = self.conn.execute(
+                    "SELECT task_id, channel, type, value FROM checkpoint_writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                    (thread_id, checkpoint_ns, row[0]),
+                ).fetchall()
+            if limit is not None:
+                limit -= 1
+            yield self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self._dumps(checkpoint)
+        _, meta = self._dumps(self._compact_metadata(metadata))
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    meta,
+                    time.time(),
+                ),
+            )
+            self._trim_thread(thread_id, checkpoint_ns)
+            self.conn.commit()
+        self._maybe_sweep()
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dumps(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, data))
+        # Special writes (errors, interrupts) are replaced, regular writes are kept once
+        verb = "INSERT OR REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "INSERT OR IGNORE"
+        with self._lock:
+            self.conn.executemany(
+                f"{verb} INTO checkpoint_writes "
+                "(thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM checkpoint_writes WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    #-------------------------------
+    # Retention
+    #-------------------------------
+    def _trim_thread(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drop all but the newest checkpoints (and their writes) of a thread. Caller holds the lock."""
+        row = self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.keep_per_thread - 1),
+        ).fetchone()
+        if row is None:
+            return
+        oldest_kept = row[0]
+        self.conn.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        )
+        self.conn.execute(
+            "DELETE FROM checkpoint_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+            (thread_id, checkpoint_ns, oldest_kept),
+        )
+
+    def _maybe_sweep(self) -> None:
+        now = time.time()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self.sweep(now)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Remove threads that are older than the age limit or beyond the thread count limit.
+
+        Args:
+            now (float, optional): Reference timestamp, defaults to the current time.
+
+        Returns:
+            int: Number of threads removed.
+        """
+        now = now or time.time()
+        cutoff = now - self.max_age_days * 86400
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT thread_id, MAX(created_at) AS last_used FROM checkpoints "
+                "GROUP BY thread_id ORDER BY last_used DESC"
+            ).fetchall()
+            expired = [
+                thread_id for i, (thread_id, last_used) in enumerate(rows)
+                if last_used < cutoff or i >= self.max_threads
+            ]
+            for thread_id in expired:
+                self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                self.conn.execute("DELETE FROM checkpoint_writes WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+        return len(expired)
+
+    #-------------------------------
+    # Async API
+    #-------------------------------
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: func(*args, **kwargs))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await self._run(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await self._run(self.delete_thread, thread_id)
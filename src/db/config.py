@@ -1,25 +1,122 @@
 import json
 import os
-# Common SQL schema for the results table
-RESULTS_TABLE_SCHEMA = """
-CREATE TABLE IF NOT EXISTS results (
+# Normalized schema for scan findings. Rule-level columns are stored once per
+# distinct rule in "rules"; "findings" keeps the per-resource columns.
+RULES_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rules (
+    "rule_key" INTEGER PRIMARY KEY,
+    "digest" TEXT NOT NULL UNIQUE,
     "type" TEXT,
     "id" TEXT,
-    "resource_name" TEXT,
-    "service_name" TEXT,
     "avdid" TEXT,
     "title" TEXT,
     "description" TEXT,
     "resolution" TEXT,
     "severity" TEXT,
-    "message" TEXT,
     "cvss_strings" TEXT,
-    "risk_score" REAL,
-    "cause_metadata" TEXT,
+    "risk_score" REAL
+);
+"""
+
+FINDINGS_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    "type" TEXT,
+    "id" TEXT,
+    "resource_name" TEXT,
+    "service_name" TEXT,
+    "message" TEXT,
+    "cause_metadata" BLOB,
+    "rule_key" INTEGER NOT NULL REFERENCES rules("rule_key"),
     PRIMARY KEY (type, id, resource_name)
 );
+CREATE INDEX IF NOT EXISTS ix_findings_rule_key ON findings (rule_key);
+"""
+
+# Compatibility view with the columns of the former results table, used by
+# generated SQL and the prompts. cause_metadata is stored zlib-compressed and needs
+# the decompress() function from src.db.sqlite_functions on the reading connection.
+RESULTS_VIEW_SCHEMA = """
+CREATE VIEW IF NOT EXISTS results AS
+SELECT
+    f.type,
+    f.id,
+    f.resource_name,
+    f.service_name,
+    r.avdid,
+    r.title,
+    r.description,
+    r.resolution,
+    r.severity,
+    f.message,
+    r.cvss_strings,
+    r.risk_score,
+    decompress(f.cause_metadata) AS cause_metadata
+FROM findings f
+JOIN rules r ON r.rule_key = f.rule_key;
+"""
+
+# Scan history. Each import of a scan type is a run; finding_ids gives every
+# (type, id, resource_name) a stable integer ID and finding_intervals records the runs
+# in which a finding was open as [opened_run, closed_run) intervals, so a run only
+# writes rows for findings that appeared or disappeared.
+SCAN_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_runs (
+    "run_id" INTEGER PRIMARY KEY AUTOINCREMENT,
+    "type" TEXT NOT NULL,
+    "started_at" TEXT NOT NULL,
+    "finished_at" TEXT
+);
+CREATE TABLE IF NOT EXISTS finding_ids (
+    "finding_id" INTEGER PRIMARY KEY,
+    "type" TEXT NOT NULL,
+    "id" TEXT NOT NULL,
+    "resource_name" TEXT NOT NULL,
+    UNIQUE (type, id, resource_name)
+);
+CREATE TABLE IF NOT EXISTS finding_intervals (
+    "finding_id" INTEGER NOT NULL REFERENCES finding_ids("finding_id"),
+    "opened_run" INTEGER NOT NULL REFERENCES scan_runs("run_id"),
+    "closed_run" INTEGER REFERENCES scan_runs("run_id"),
+    PRIMARY KEY (finding_id, opened_run)
+);
+CREATE INDEX IF NOT EXISTS ix_finding_intervals_closed_run ON finding_intervals (closed_run);
+CREATE TABLE IF NOT EXISTS scan_run_stats (
+    "run_id" INTEGER PRIMARY KEY REFERENCES scan_runs("run_id"),
+    "new_count" INTEGER NOT NULL,
+    "fixed_count" INTEGER NOT NULL,
+    "open_count" INTEGER NOT NULL
+);
+"""
+
+# Views over the scan history for trend questions and generated SQL
+SCAN_HISTORY_VIEWS_SCHEMA = """
+CREATE VIEW IF NOT EXISTS scan_trends AS
+SELECT
+    r.run_id,
+    r.type,
+    r.started_at AS scanned_at,
+    s.new_count,
+    s.fixed_count,
+    s.open_count
+FROM scan_runs r
+JOIN scan_run_stats s ON s.run_id = r.run_id;
+
+CREATE VIEW IF NOT EXISTS finding_history AS
+SELECT
+    f.type,
+    f.id,
+    f.resource_name,
+    o.started_at AS opened_at,
+    c.started_at AS fixed_at
+FROM finding_intervals i
+JOIN finding_ids f ON f.finding_id = i.finding_id
+JOIN scan_runs o ON o.run_id = i.opened_run
+LEFT JOIN scan_runs c ON c.run_id = i.closed_run;
 """
 
+RESULTS_TABLE_SCHEMA = (RULES_TABLE_SCHEMA + FINDINGS_TABLE_SCHEMA + RESULTS_VIEW_SCHEMA
+                        + SCAN_HISTORY_SCHEMA + SCAN_HISTORY_VIEWS_SCHEMA)
+
 CHAT_HISTORY_TABLE_SCHEMA = """
 CREATE TABLE users (
     "id" UUID PRIMARY KEY,
@@ -218,3 +315,9 @@ SAMPLE_DATA = [
 
 # Default database path
 DEFAULT_DB_PATH = os.getenv("DEFAULT_DB_PATH", "/sqlite/chainlit.db")
+
+# LangGraph checkpoint retention
+CHECKPOINT_KEEP_PER_THREAD = int(os.getenv("CHECKPOINT_KEEP_PER_THREAD", "3"))
+CHECKPOINT_MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", "30"))
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+CHECKPOINT_SWEEP_INTERVAL = int(os.getenv("CHECKPOINT_SWEEP_INTERVAL", "600"))
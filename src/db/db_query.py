@@ -1,25 +1,25 @@
 import sqlite3
 import os
 import re
-from langchain_openai import ChatOpenAI
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain.prompts import PromptTemplate
 import asyncio
-import sqlparse
-from sqlalchemy import create_engine, text
-import pandas as pd
-from src.utils.utils import reasoning_prompt
+from src.utils.utils import reasoning_prompt, static_prompt, log_cache_usage
+from src.utils.metrics import timed_query
+
+SQL_SYSTEM_PROMPT = "You are a SQL query generator. Respond only with a valid SQL query string, with no explanation or additional text. The output must be ready to run directly as a SQL command."
 
 # Generate query string
 async def generate_query(q, category, model):
     try:
-        content = reasoning_prompt("./src/prompts/db_query_prompt.txt", QUESTION=q, category=category)
+        # Static instructions, schema and examples first, the question last
+        content = reasoning_prompt("./src/prompts/db_query_question_prompt.txt", QUESTION=q, category=category)
         local_messages = [
-            SystemMessage(content="You are a SQL query generator. Respond only with a valid SQL query string, with no explanation or additional text. The output must be ready to run directly as a SQL command."),
+            SystemMessage(content=SQL_SYSTEM_PROMPT + "\n\n" + static_prompt("./src/prompts/db_query_prompt.txt")),
             HumanMessage(content=content)
         ]
         response = await model.ainvoke(local_messages)
+        log_cache_usage("sql", response)
         #remove code delimiter if exist
         sql = response.content
         sql = sql.replace("```sql", "").replace("```", "")
@@ -30,6 +30,10 @@ async def generate_query(q, category, model):
 
 
 def is_valid_query(query, engine):
+    # Imported on first use to keep them off the app's import path
+    import sqlparse
+    from sqlalchemy import text
+
     try:
         # Check for SQL injection by ensuring it is a read-only query
         parsed = sqlparse.parse(query)
@@ -60,60 +64,50 @@ def limit_string_length(resource_string, max_length=200):
         result += new_part
     return result
 
+@timed_query("summary")
 async def query_summary(conn, cate: str):
     category = cate.upper()
     if category not in ["CODE", "KUBERNETES", "AWS", "CONTAINER", "ALL"]:
         return None, None
 
+    import pandas as pd
 
-    query_one = f"""SELECT
-      id,
-      type,
-      description,
-      resolution,
-      severity,
-      risk_score,
-      COUNT(*) AS resource_count,
-      group_concat(resource_name, ', ') AS resource_names
-    FROM
-      results
-    WHERE
-      type = "{category}"
-    GROUP BY
-      type,
-      avdid,
-      title,
-      description,
-      severity,
-      risk_score
-    ORDER BY
-      risk_score DESC;"""
-
-    query_all = f"""SELECT
-      id,
-      type,
-      description,
-      resolution,
-      severity,
-      risk_score,
-      COUNT(*) AS resource_count,
-      group_concat(resource_name, ', ') AS resource_names
+    # Count findings per rule on the slim findings table first, then join the
+    # rule columns once per rule instead of once per finding
+    where = "" if category == "ALL" else f'WHERE r.type = "{category}"'
+    query = f"""SELECT
+      r.id,
+      r.type,
+      r.description,
+      r.resolution,
+      r.severity,
+      r.risk_score,
+      SUM(f.resource_count) AS resource_count,
+      group_concat(f.resource_names, ', ') AS resource_names
     FROM
-      results
+      (
+        SELECT
+          rule_key,
+          COUNT(*) AS resource_count,
+          group_concat(resource_name, ', ') AS resource_names
+        FROM
+          findings
+        GROUP BY
+          rule_key
+      ) AS f
+      JOIN rules AS r ON r.rule_key = f.rule_key
+    {where}
     GROUP BY
-      type,
-      avdid,
-      title,
-      description,
-      severity,
-      risk_score
+      r.type,
+      r.avdid,
+      r.title,
+      r.description,
+      r.severity,
+      r.risk_score
     ORDER BY
       risk_score DESC;"""
 
-    if category == "ALL":
-        table_df = pd.read_sql_query(query_all, conn)
-    else:
-        table_df = pd.read_sql_query(query_one, conn)
+    table_df = pd.read_sql_query(query, conn)
 
     summary_df = table_df.groupby(['type','severity']).agg(
         total_resource_count=('resource_count', 'sum'),
@@ -123,3 +117,49 @@ async def query_summary(conn, cate: str):
     table_df['resource_names'] = table_df['resource_names'].apply(limit_string_length, max_length=200)
 
     return summary_df, table_df.head(30)
+
+@timed_query("trend")
+async def query_trend(conn, cate: str, limit: int = 10):
+    """
+    Query new/fixed/open finding counts of the most recent scan runs.
+
+    Args:
+        conn: SQLite connection.
+        cate (str): Scan category (CODE, KUBERNETES, AWS, CONTAINER or ALL).
+        limit (int): Maximum number of runs per category.
+
+    Returns:
+        pd.DataFrame: One row per run, oldest first; empty when no history is recorded.
+    """
+    category = cate.upper()
+    if category not in ["CODE", "KUBERNETES", "AWS", "CONTAINER", "ALL"]:
+        return None
+
+    import pandas as pd
+
+    query = """SELECT
+      type,
+      scanned_at,
+      new_count,
+      fixed_count,
+      open_count
+    FROM
+      (
+        SELECT
+          *,
+          ROW_NUMBER() OVER (PARTITION BY type ORDER BY run_id DESC) AS run_rank
+        FROM
+          scan_trends
+        WHERE
+          type = :category OR :category = 'ALL'
+      )
+    WHERE
+      run_rank <= :limit
+    ORDER BY
+      type,
+      run_id;"""
+    try:
+        return pd.read_sql_query(query, conn, params={"category": category, "limit": limit})
+    except Exception as e:
+        print(f"Error querying scan trend: {e}")
+        return pd.DataFrame()
@@ -23,7 +23,7 @@ logger = logging.getLogger("db_refresh")
 
 async def refresh_database(db_path, force=False):
     """
-    Refresh the database by deleting all records from the 'results' table.
+    Refresh the database by deleting all findings and rules behind the 'results' view.
     
     Args:
         db_path (str): Path to the database file
@@ -42,9 +42,10 @@ async def refresh_database(db_path, force=False):
     try:
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                delete_stmt = text("DELETE FROM results")
-                await session.execute(delete_stmt)
-                logger.info("Deleted all records from 'results' table.")
+                # "results" is a view over findings and rules
+                await session.execute(text("DELETE FROM findings"))
+                await session.execute(text("DELETE FROM rules"))
+                logger.info("Deleted all records from 'findings' and 'rules' tables.")
             await session.commit()
 
         end_time_str = datetime.datetime.now().isoformat()
@@ -1,39 +1,72 @@
 import os
 import sqlite3
-from sqlalchemy import create_engine
 
-import chainlit.data as cl_data
-from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
+import chainlit as cl
 from chainlit.logger import logger
 from src.db.sqlite_storage import SQLiteStorageClient
 from src.db.config import DEFAULT_DB_PATH
+from src.db.sqlite_functions import register_sqlite_functions, install_sqlite_functions
 
 class AppContext:
+    """
+    Database connections of the app, opened on first use.
+
+    SQLAlchemy (engine, snapshot helpers) is imported on the first connection
+    rather than when the app module is loaded.
+    """
     def __init__(self):
-        self.storage_client = None
+        self._storage_client = None
         self.conn = None
         self.engine = None
         self.db_path = DEFAULT_DB_PATH
-        self._last_modified = None
+        self.generation = None
+        self._inode = None
+
+    @property
+    def storage_client(self):
+        if self._storage_client is None:
+            self._storage_client = SQLiteStorageClient(database_path=self.db_path)
+        return self._storage_client
+
+    @storage_client.setter
+    def storage_client(self, client):
+        self._storage_client = client
 
     def check_and_reconnect(self):
-        """Check if database file has been modified and reconnect if needed"""
+        """
+        Reconnect if the database file has been replaced (new inode).
+
+        Imports publish new findings snapshots inside the same file, which an open
+        connection sees without reconnecting; the snapshot generation is tracked so
+        that switches are logged once.
+        """
+        from sqlalchemy import create_engine
+        from src.db.snapshot import get_generation
+
         try:
             if not os.path.exists(self.db_path):
                 logger.error(f"Database file not found: {self.db_path}")
                 return False
-            
-            current_modified = os.path.getmtime(self.db_path)
-            if self._last_modified != current_modified:
+
+            current_inode = os.stat(self.db_path).st_ino
+            if self._inode != current_inode:
                 # Close existing connection if it exists
                 if self.conn:
                     self.conn.close()
-                
+
                 # Reconnect
                 self.conn = sqlite3.connect(self.db_path)
+                register_sqlite_functions(self.conn)
                 self.engine = create_engine(f"sqlite:///{self.db_path}")
-                self._last_modified = current_modified
+                install_sqlite_functions(self.engine)
+                self._inode = current_inode
+                self.generation = get_generation(self.conn)
                 return True
+
+            generation = get_generation(self.conn)
+            if generation != self.generation:
+                logger.info(f"Findings snapshot generation {self.generation} -> {generation}")
+                self.generation = generation
             return False
         except (sqlite3.Error, OSError) as e:
             logger.error(f"Database reconnection error: {e}")
@@ -49,22 +82,26 @@ class AppContext:
 
 def setup_database_connections():
     """
-    Configure and return database connections based on environment
+    Configure and return database connections based on environment.
+
+    Nothing is opened here: the connection, the storage client and the Chainlit
+    data layer are created when they are first used.
     """
 
     app_context = AppContext()
-    # Initial connection
-    app_context.check_and_reconnect()
 
     # SQLite setup
     conn_str = f"sqlite+aiosqlite:///{app_context.db_path}"
-    app_context.storage_client = SQLiteStorageClient(database_path=app_context.db_path)
-    
-    # Set up data layer
-    logger.info(f"Using database connection: {conn_str}")
-    cl_data._data_layer = SQLAlchemyDataLayer(
-        conninfo=conn_str,
-        storage_provider=app_context.storage_client
-    )
+
+    # Set up data layer, built by Chainlit on its first request
+    @cl.data_layer
+    def sqlite_data_layer():
+        from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
+
+        logger.info(f"Using database connection: {conn_str}")
+        return SQLAlchemyDataLayer(
+            conninfo=conn_str,
+            storage_provider=app_context.storage_client
+        )
 
     return app_context
@@ -1,20 +1,113 @@
 import asyncio
 import csv
+import datetime
 import os
-from sqlalchemy import Column, Integer, String, Float, Text, PrimaryKeyConstraint, select
+from sqlalchemy import Column, Integer, String, Float, Text, LargeBinary, PrimaryKeyConstraint, UniqueConstraint, ForeignKey, Index, select, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.exc import SQLAlchemyError
+import hashlib
 import json
+import math
 import sqlite3
 
 # Import from config module
-from src.db.config import RESULTS_TABLE_SCHEMA, CHAT_HISTORY_TABLE_SCHEMA, SAMPLE_DATA, DEFAULT_DB_PATH
+from src.db.sqlite_functions import compress_text, install_sqlite_functions, register_sqlite_functions
+from src.db.config import RESULTS_TABLE_SCHEMA, RESULTS_VIEW_SCHEMA, SCAN_HISTORY_VIEWS_SCHEMA, CHAT_HISTORY_TABLE_SCHEMA, SAMPLE_DATA, DEFAULT_DB_PATH
 
 # Define the base class for declarative models
 Base = declarative_base()
 
-# Define the "results" table with a composite primary key (type, id, resource_name)
+# Rule-level columns, stored once per distinct rule content
+RULE_COLUMNS = ["type", "id", "avdid", "title", "description", "resolution", "severity", "cvss_strings", "risk_score"]
+# Per-resource columns, stored once per finding
+FINDING_COLUMNS = ["type", "id", "resource_name", "service_name", "message", "cause_metadata"]
+
+# Define the "rules" table; digest identifies a rule by the content of its columns
+class Rules(Base):
+    __tablename__ = "rules"
+
+    rule_key = Column(Integer, primary_key=True)
+    digest = Column(String, nullable=False, unique=True)
+    type = Column(String)
+    id = Column(String)
+    avdid = Column(String)
+    title = Column(String)
+    description = Column(Text)
+    resolution = Column(Text)
+    severity = Column(String)
+    cvss_strings = Column(String)
+    risk_score = Column(Float)
+
+# Define the "findings" table with a composite primary key (type, id, resource_name)
+class Findings(Base):
+    __tablename__ = "findings"
+
+    type = Column(String)
+    id = Column(String)
+    resource_name = Column(String)
+    service_name = Column(String)
+    message = Column(Text)
+    cause_metadata = Column(LargeBinary)  # zlib-compressed, see src.db.sqlite_functions
+    rule_key = Column(Integer, ForeignKey("rules.rule_key"), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("type", "id", "resource_name"),
+        Index("ix_findings_rule_key", "rule_key"),
+    )
+
+# Scan history: one row per import of a scan type
+class ScanRuns(Base):
+    __tablename__ = "scan_runs"
+
+    run_id = Column(Integer, primary_key=True, autoincrement=True)
+    type = Column(String, nullable=False)
+    started_at = Column(String, nullable=False)
+    finished_at = Column(String)
+
+# Stable integer ID per (type, id, resource_name)
+class FindingIds(Base):
+    __tablename__ = "finding_ids"
+
+    finding_id = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    id = Column(String, nullable=False)
+    resource_name = Column(String, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("type", "id", "resource_name"),
+    )
+
+# Runs in which a finding was open, as [opened_run, closed_run) intervals
+class FindingIntervals(Base):
+    __tablename__ = "finding_intervals"
+
+    finding_id = Column(Integer, ForeignKey("finding_ids.finding_id"), nullable=False)
+    opened_run = Column(Integer, ForeignKey("scan_runs.run_id"), nullable=False)
+    closed_run = Column(Integer, ForeignKey("scan_runs.run_id"))
+
+    __table_args__ = (
+        PrimaryKeyConstraint("finding_id", "opened_run"),
+        Index("ix_finding_intervals_closed_run", "closed_run"),
+    )
+
+# New/fixed/open counts computed when a run is recorded
+class ScanRunStats(Base):
+    __tablename__ = "scan_run_stats"
+
+    run_id = Column(Integer, ForeignKey("scan_runs.run_id"), primary_key=True)
+    new_count = Column(Integer, nullable=False)
+    fixed_count = Column(Integer, nullable=False)
+    open_count = Column(Integer, nullable=False)
+
+# Tables created by create_all; "results" and the history views are created from SQL
+SCHEMA_TABLES = [
+    Rules.__table__, Findings.__table__,
+    ScanRuns.__table__, FindingIds.__table__, FindingIntervals.__table__, ScanRunStats.__table__,
+]
+
+# Map the "results" compatibility view (findings joined with rules) for reads.
+# It is created from RESULTS_VIEW_SCHEMA, not by create_all.
 class Results(Base):
     __tablename__ = "results"
 
@@ -43,6 +136,7 @@ class Results(Base):
 # Create an async engine; using the "aiosqlite" dialect for SQLite.
 DATABASE_URL = f"sqlite+aiosqlite:///{DEFAULT_DB_PATH}"
 engine = create_async_engine(DATABASE_URL, echo=True)
+install_sqlite_functions(engine)
 
 # Create a session maker for async sessions.
 AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
@@ -61,6 +155,7 @@ def ensure_directory_exists(db_path):
 
 def _init_db_sync(db_path, sql_script):
     conn = sqlite3.connect(db_path)
+    register_sqlite_functions(conn)
     cursor = conn.cursor()
     cursor.executescript(sql_script)
     conn.commit()
@@ -105,11 +200,19 @@ async def init_db(db_path=DEFAULT_DB_PATH):
         # Update the engine to use the provided path
         global engine, AsyncSessionLocal, DATABASE_URL
         engine = create_async_engine(DATABASE_URL, echo=True)
+        install_sqlite_functions(engine)
         AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
         
-        # Create tables using SQLAlchemy metadata
+        # Create tables using SQLAlchemy metadata; "results" is a view over them
         async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(Base.metadata.create_all, tables=SCHEMA_TABLES)
+            await conn.run_sync(_migrate_legacy_results)
+            # Recreate the view so databases from older versions pick up its current definition
+            await conn.exec_driver_sql("DROP VIEW IF EXISTS results")
+            await conn.exec_driver_sql(RESULTS_VIEW_SCHEMA)
+            for statement in SCAN_HISTORY_VIEWS_SCHEMA.split(";"):
+                if statement.strip():
+                    await conn.exec_driver_sql(statement)
             print("Tables created successfully using SQLAlchemy")
         return True
     except Exception as e:
@@ -142,47 +245,278 @@ async def init_sample(db_path=DEFAULT_DB_PATH):
         print(f"Error adding sample data: {e}")
         return False
 
-async def upsert_record(record_data: dict) -> Results:
+def rule_digest(record: dict) -> str:
     """
-    Upsert (insert or update) a record into the results table.
+    Compute the digest identifying a rule by the content of its rule-level columns.
 
     Args:
-        record_data (dict): A dictionary of column values for the record.
+        record (dict): A record with the RULE_COLUMNS keys.
 
     Returns:
-        Results: The upserted record.
+        str: Hex SHA-1 digest.
+    """
+    values = [record.get(column) for column in RULE_COLUMNS]
+    # NaN scores are stored as NULL
+    values = [None if isinstance(v, float) and math.isnan(v) else v for v in values]
+    return hashlib.sha1(json.dumps(values, default=str).encode("utf-8")).hexdigest()
+
+def _upsert_normalized(session_or_conn, records_data: list[dict], chunk_size: int = 500) -> int:
+    """
+    Write records with the columns of the results view into the rules and findings tables.
+
+    Args:
+        session_or_conn: A synchronous SQLAlchemy Session or Connection inside a transaction.
+        records_data (list[dict]): Records with the results view columns.
+        chunk_size (int): Number of digests looked up per query.
+
+    Returns:
+        int: The number of findings written.
+    """
+    # Digest each distinct rule once; records of the same rule share their values
+    digests = {}
+    record_digests = []
+    for record in records_data:
+        key = tuple(record.get(column) for column in RULE_COLUMNS)
+        digest = digests.get(key)
+        if digest is None:
+            digest = digests[key] = rule_digest(record)
+        record_digests.append(digest)
+
+    rules = {}
+    for key, digest in digests.items():
+        rule = dict(zip(RULE_COLUMNS, key))
+        if isinstance(rule["risk_score"], float) and math.isnan(rule["risk_score"]):
+            rule["risk_score"] = None
+        rule["digest"] = digest
+        rules[digest] = rule
+    if not rules:
+        return 0
+
+    columns = ", ".join(["digest"] + RULE_COLUMNS)
+    params = ", ".join(f":{column}" for column in ["digest"] + RULE_COLUMNS)
+    session_or_conn.execute(
+        text(f"INSERT INTO rules ({columns}) VALUES ({params}) ON CONFLICT(digest) DO NOTHING"),
+        list(rules.values()),
+    )
+
+    rule_keys = {}
+    digest_list = list(rules)
+    for start in range(0, len(digest_list), chunk_size):
+        chunk = digest_list[start:start + chunk_size]
+        placeholders = ", ".join(f":d{i}" for i in range(len(chunk)))
+        rows = session_or_conn.execute(
+            text(f"SELECT digest, rule_key FROM rules WHERE digest IN ({placeholders})"),
+            {f"d{i}": digest for i, digest in enumerate(chunk)},
+        )
+        rule_keys.update((digest, rule_key) for digest, rule_key in rows)
+
+    findings = [
+        {
+            **{column: record.get(column) for column in FINDING_COLUMNS},
+            "cause_metadata": compress_text(record.get("cause_metadata")),
+            "rule_key": rule_keys[digest],
+        }
+        for record, digest in zip(records_data, record_digests)
+    ]
+    session_or_conn.execute(
+        text(
+            "INSERT INTO findings (type, id, resource_name, service_name, message, cause_metadata, rule_key) "
+            "VALUES (:type, :id, :resource_name, :service_name, :message, :cause_metadata, :rule_key) "
+            "ON CONFLICT(type, id, resource_name) DO UPDATE SET "
+            "service_name = excluded.service_name, message = excluded.message, "
+            "cause_metadata = excluded.cause_metadata, rule_key = excluded.rule_key"
+        ),
+        findings,
+    )
+    return len(findings)
+
+def _delete_unused_rules(session_or_conn) -> int:
+    """
+    Drop rules no longer referenced after findings moved to a new rule version.
+    Scans all rules, so callers run it once per import rather than per batch.
+
+    Args:
+        session_or_conn: A synchronous SQLAlchemy Session or Connection inside a transaction.
+
+    Returns:
+        int: The number of deleted rules.
+    """
+    return session_or_conn.execute(text(
+        "DELETE FROM rules WHERE NOT EXISTS (SELECT 1 FROM findings f WHERE f.rule_key = rules.rule_key)"
+    )).rowcount
+
+def _migrate_legacy_results(conn, chunk_size: int = 10000):
+    """
+    Move rows from a legacy "results" table into rules/findings and drop the table,
+    so that the results view can take its name.
+
+    Args:
+        conn: A synchronous SQLAlchemy Connection inside a transaction.
+        chunk_size (int): Number of rows moved per batch.
+    """
+    kind = conn.execute(text("SELECT type FROM sqlite_master WHERE name = 'results'")).scalar()
+    if kind != "table":
+        return
+    print("Migrating legacy results table to rules/findings...")
+    migrated = 0
+    result = conn.execute(text("SELECT * FROM results"))
+    while True:
+        rows = result.mappings().fetchmany(chunk_size)
+        if not rows:
+            break
+        migrated += _upsert_normalized(conn, [dict(row) for row in rows])
+    _delete_unused_rules(conn)
+    conn.execute(text("DROP TABLE results"))
+    print(f"Migrated {migrated} findings")
+
+def _utc_now() -> str:
+    # Same format as SQLite's datetime('now'), so views can be compared with it
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def _record_scan_run(conn, record_type: str, keys: set) -> dict:
+    """
+    Record a scan run for one scan type and update the finding intervals.
+    Only findings that appeared or disappeared since the previous run are written.
+
+    Args:
+        conn: A synchronous SQLAlchemy Session or Connection inside a transaction.
+        record_type (str): The scan type (CODE, CONTAINER, KUBERNETES, AWS).
+        keys (set): (id, resource_name) pairs present in this run.
+
+    Returns:
+        dict: run_id, new_count, fixed_count and open_count.
+    """
+    run_id = conn.execute(
+        text("INSERT INTO scan_runs (type, started_at) VALUES (:type, :now)"),
+        {"type": record_type, "now": _utc_now()},
+    ).lastrowid
+
+    # The run's keys go to a temporary table, so that only they are resolved to finding IDs
+    # and compared with the open intervals, however long the history is
+    conn.execute(text("CREATE TEMP TABLE IF NOT EXISTS scan_run_keys "
+                      "(id TEXT NOT NULL, resource_name TEXT NOT NULL, finding_id INTEGER, "
+                      "PRIMARY KEY (id, resource_name))"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS temp.ix_scan_run_keys_finding_id ON scan_run_keys (finding_id)"))
+    conn.execute(text("DELETE FROM scan_run_keys"))
+    if keys:
+        conn.execute(
+            text("INSERT INTO scan_run_keys (id, resource_name) VALUES (:id, :resource_name)"),
+            [{"id": id_, "resource_name": resource_name} for id_, resource_name in keys],
+        )
+    # WHERE true lets SQLite parse the upsert clause after a SELECT
+    conn.execute(
+        text("INSERT INTO finding_ids (type, id, resource_name) SELECT :type, id, resource_name FROM scan_run_keys "
+             "WHERE true ON CONFLICT(type, id, resource_name) DO NOTHING"),
+        {"type": record_type},
+    )
+    conn.execute(
+        text("UPDATE scan_run_keys SET finding_id = (SELECT f.finding_id FROM finding_ids f "
+             "WHERE f.type = :type AND f.id = scan_run_keys.id AND f.resource_name = scan_run_keys.resource_name)"),
+        {"type": record_type},
+    )
+
+    fixed_count = conn.execute(
+        text("UPDATE finding_intervals SET closed_run = :run_id WHERE closed_run IS NULL "
+             "AND EXISTS (SELECT 1 FROM finding_ids f WHERE f.finding_id = finding_intervals.finding_id AND f.type = :type) "
+             "AND NOT EXISTS (SELECT 1 FROM scan_run_keys k WHERE k.finding_id = finding_intervals.finding_id)"),
+        {"run_id": run_id, "type": record_type},
+    ).rowcount
+    new_count = conn.execute(
+        text("INSERT INTO finding_intervals (finding_id, opened_run) SELECT k.finding_id, :run_id FROM scan_run_keys k "
+             "WHERE NOT EXISTS (SELECT 1 FROM finding_intervals i WHERE i.finding_id = k.finding_id AND i.closed_run IS NULL)"),
+        {"run_id": run_id},
+    ).rowcount
+    conn.execute(text("DELETE FROM scan_run_keys"))
+
+    stats = {"run_id": run_id, "new_count": new_count, "fixed_count": fixed_count, "open_count": len(keys)}
+    conn.execute(
+        text("INSERT INTO scan_run_stats (run_id, new_count, fixed_count, open_count) "
+             "VALUES (:run_id, :new_count, :fixed_count, :open_count)"),
+        stats,
+    )
+    conn.execute(
+        text("UPDATE scan_runs SET finished_at = :now WHERE run_id = :run_id"),
+        {"now": _utc_now(), "run_id": run_id},
+    )
+    return stats
+
+async def record_scan_run(records_data: list[dict], record_types: list[str] = None) -> list[dict]:
+    """
+    Record one scan run per scan type present in the imported records.
+
+    Args:
+        records_data (list[dict]): The records of a complete import, with type, id and resource_name.
+        record_types (list[str], optional): Scan types the import covers, so that a scan
+            without findings still closes the previously open ones.
+
+    Returns:
+        list[dict]: The run statistics of each recorded run.
+    """
+    keys_by_type = {record_type: set() for record_type in record_types or []}
+    for record in records_data:
+        keys_by_type.setdefault(record["type"], set()).add((record["id"], record["resource_name"]))
+    try:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                runs = [
+                    await session.run_sync(_record_scan_run, record_type, keys)
+                    for record_type, keys in keys_by_type.items()
+                ]
+            await session.commit()
+        for run in runs:
+            print(f"Recorded scan run {run}")
+        return runs
+    except SQLAlchemyError as e:
+        print(f"Error recording scan run: {e}")
+        raise
+
+async def delete_unused_rules() -> int:
+    """
+    Delete the rules that no finding references any more, after an upsert import.
+
+    Returns:
+        int: The number of deleted rules.
     """
     try:
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                # Use merge to perform an upsert.
-                merged_record = await session.merge(Results(**record_data))
+                deleted = await session.run_sync(_delete_unused_rules)
             await session.commit()
-            return merged_record
+        return deleted
     except SQLAlchemyError as e:
-        print(f"Error upserting record: {e}")
+        print(f"Error deleting unused rules: {e}")
         raise
 
-async def batch_upsert_records(records_data: list[dict]) -> list[Results]:
+async def upsert_record(record_data: dict) -> Results:
+    """
+    Upsert (insert or update) a record into the rules and findings tables.
+
+    Args:
+        record_data (dict): A dictionary of results view column values for the record.
+
+    Returns:
+        Results: The upserted record.
+    """
+    await batch_upsert_records([record_data])
+    return Results(**record_data)
+
+async def batch_upsert_records(records_data: list[dict]) -> int:
     """
-    Upsert (insert or update) multiple records into the results table in a single transaction.
+    Upsert (insert or update) multiple records into the rules and findings tables in a single transaction.
+    Rules left without findings are kept until delete_unused_rules() runs.
 
     Args:
-        records_data (list[dict]): A list of dictionaries, each containing column values for a record.
+        records_data (list[dict]): A list of dictionaries, each containing the results view columns for a record.
 
     Returns:
-        list[Results]: A list of upserted records.
+        int: The number of upserted records.
     """
-    upserted_records = []
     try:
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                for record_data in records_data:
-                    # Use merge to perform an upsert.
-                    merged_record = await session.merge(Results(**record_data))
-                    upserted_records.append(merged_record)
+                count = await session.run_sync(_upsert_normalized, records_data)
             await session.commit()
-        return upserted_records
+        return count
     except SQLAlchemyError as e:
         print(f"Error batch upserting records: {e}")
         raise
@@ -0,0 +1,190 @@
+import os
+import re
+import sqlite3
+from typing import Iterable, Optional
+
+from src.db.config import DEFAULT_DB_PATH, RULES_TABLE_SCHEMA, FINDINGS_TABLE_SCHEMA, RESULTS_VIEW_SCHEMA
+from src.db.db_util import RULE_COLUMNS, FINDING_COLUMNS, rule_digest
+from src.db.sqlite_functions import compress_text, register_sqlite_functions
+
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "20000"))
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))
+
+# The findings index alternates between these names, so the staging index can be
+# built before the swap while the live one still exists
+FINDINGS_INDEX_NAMES = ("ix_findings_rule_key", "ix_findings_rule_key_b")
+
+
+def _staging_schema(schema: str) -> str:
+    """Rename the rules/findings tables in a schema to their staging names, without indexes."""
+    schema = re.sub(r"CREATE INDEX[^;]*;", "", schema)
+    return re.sub(r'\b(rules|findings)\b(?=\s*[ ("])', r"\1_staging", schema)
+
+
+def get_generation(conn: sqlite3.Connection) -> int:
+    """
+    Return the generation of the published findings snapshot.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the results database.
+
+    Returns:
+        int: The generation, stored as PRAGMA user_version and bumped by every publish.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+class SnapshotBuilder:
+    """
+    Build a complete findings snapshot in staging tables and publish it atomically.
+
+    Records are bulk-inserted into rules_staging/findings_staging in committed batches,
+    which readers never query. publish() then drops the live tables, renames the
+    staging tables and recreates the results view in one short transaction, so readers
+    see either the previous snapshot or the new one, never a partial import.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = SNAPSHOT_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.conn: Optional[sqlite3.Connection] = None
+        self.count = 0
+        self._rule_keys: dict[str, int] = {}
+        self._digests: dict[tuple, str] = {}
+
+    def begin(self) -> None:
+        """Create empty staging tables, discarding leftovers of an interrupted build."""
+        # Used from executor threads, one call at a time
+        self.conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        register_sqlite_functions(self.conn)
+        self.conn.execute("BEGIN")
+        self.conn.execute("DROP TABLE IF EXISTS findings_staging")
+        self.conn.execute("DROP TABLE IF EXISTS rules_staging")
+        for statement in _staging_schema(RULES_TABLE_SCHEMA + FINDINGS_TABLE_SCHEMA).split(";"):
+            if statement.strip():
+                self.conn.execute(statement)
+        self.conn.execute("COMMIT")
+        self.count = 0
+        self._rule_keys.clear()
+        self._digests.clear()
+
+    def add(self, records_data: list[dict]) -> int:
+        """
+        Bulk-insert records with the results view columns into the staging tables.
+
+        Args:
+            records_data (list[dict]): The records to add.
+
+        Returns:
+            int: The number of records added.
+        """
+        for start in range(0, len(records_data), self.batch_size):
+            self._add_batch(records_data[start:start + self.batch_size])
+        self.count += len(records_data)
+        return len(records_data)
+
+    def _add_batch(self, records_data: list[dict]) -> None:
+        new_rules = []
+        findings = []
+        for record in records_data:
+            key = tuple(record.get(column) for column in RULE_COLUMNS)
+            digest = self._digests.get(key)
+            if digest is None:
+                digest = self._digests[key] = rule_digest(record)
+            rule_key = self._rule_keys.get(digest)
+            if rule_key is None:
+                rule_key = self._rule_keys[digest] = len(self._rule_keys) + 1
+                risk_score = record.get("risk_score")
+                if isinstance(risk_score, float) and risk_score != risk_score:
+                    risk_score = None
+                new_rules.append((rule_key, digest) + key[:-1] + (risk_score,))
+            findings.append(
+                tuple(record.get(column) for column in FINDING_COLUMNS[:-1])
+                + (compress_text(record.get("cause_metadata")), rule_key)
+            )
+
+        rule_columns = ["rule_key", "digest"] + RULE_COLUMNS
+        finding_columns = FINDING_COLUMNS + ["rule_key"]
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                f"INSERT INTO rules_staging ({', '.join(rule_columns)}) VALUES ({', '.join('?' * len(rule_columns))})",
+                new_rules,
+            )
+            # Later records win, as with the upsert path
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO findings_staging ({', '.join(finding_columns)}) "
+                f"VALUES ({', '.join('?' * len(finding_columns))})",
+                findings,
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def carry_over(self, record_types: Iterable[str]) -> int:
+        """
+        Copy the live findings of scan types that are not re-imported into the snapshot.
+
+        Args:
+            record_types (Iterable[str]): Scan types to keep (CODE, CONTAINER, KUBERNETES, AWS).
+
+        Returns:
+            int: The number of findings copied.
+        """
+        record_types = list(record_types)
+        if not record_types:
+            return 0
+        placeholders = ", ".join("?" * len(record_types))
+        cursor = self.conn.execute(
+            f"""SELECT f.type, f.id, f.resource_name, f.service_name, r.avdid, r.title, r.description,
+                       r.resolution, r.severity, f.message, r.cvss_strings, r.risk_score, f.cause_metadata
+                FROM findings f JOIN rules r ON r.rule_key = f.rule_key
+                WHERE f.type IN ({placeholders})""",
+            record_types,
+        )
+        columns = [description[0] for description in cursor.description]
+        copied = 0
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            # cause_metadata is copied as stored; compress_text leaves bytes unchanged
+            copied += self.add([dict(zip(columns, row)) for row in rows])
+        return copied
+
+    def publish(self) -> int:
+        """
+        Swap the staging tables in as the live rules/findings tables in one transaction.
+
+        Returns:
+            int: The new generation.
+        """
+        live_indexes = {
+            row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        }
+        index_name = next(name for name in FINDINGS_INDEX_NAMES if name not in live_indexes)
+        # Built outside the swap transaction; staging tables are not visible to readers
+        self.conn.execute(f"CREATE INDEX {index_name} ON findings_staging (rule_key)")
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            generation = get_generation(self.conn) + 1
+            self.conn.execute("DROP VIEW IF EXISTS results")
+            self.conn.execute("DROP TABLE IF EXISTS findings")
+            self.conn.execute("DROP TABLE IF EXISTS rules")
+            self.conn.execute("ALTER TABLE rules_staging RENAME TO rules")
+            self.conn.execute("ALTER TABLE findings_staging RENAME TO findings")
+            self.conn.execute(RESULTS_VIEW_SCHEMA)
+            self.conn.execute(f"PRAGMA user_version = {generation}")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        print(f"Published findings snapshot generation {generation} with {self.count} findings")
+        return generation
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,68 @@
+import os
+import zlib
+from typing import Optional, Union
+
+# Values shorter than this are stored as plain TEXT; zlib overhead outweighs the gain
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "64"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+
+
+def compress_text(value: Optional[str]) -> Optional[Union[bytes, str]]:
+    """
+    Compress a text column value for storage.
+
+    Args:
+        value (str): The text to store.
+
+    Returns:
+        bytes or str: zlib-compressed UTF-8 bytes, or the value unchanged when it is
+        short or not a string.
+    """
+    if not isinstance(value, str) or len(value) < COMPRESS_MIN_SIZE:
+        return value
+    return zlib.compress(value.encode("utf-8"), COMPRESS_LEVEL)
+
+
+def decompress(value: Optional[Union[bytes, str]]) -> Optional[str]:
+    """
+    Inverse of compress_text. Plain TEXT values written before compression was
+    introduced are returned unchanged.
+
+    Args:
+        value (bytes or str): The stored value.
+
+    Returns:
+        str: The decompressed text.
+    """
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def register_sqlite_functions(dbapi_connection) -> None:
+    """
+    Register the decompress() SQL function used by the results view on a DB-API
+    connection (sqlite3, or SQLAlchemy's aiosqlite adapter).
+
+    Args:
+        dbapi_connection: The connection to register the functions on.
+    """
+    dbapi_connection.create_function("decompress", 1, decompress, deterministic=True)
+
+
+def install_sqlite_functions(engine) -> None:
+    """
+    Register the SQL functions on every new connection of a SQLAlchemy engine.
+
+    Args:
+        engine: A sync Engine or an AsyncEngine.
+    """
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "connect", _on_connect):
+        event.listen(sync_engine, "connect", _on_connect)
+
+
+def _on_connect(dbapi_connection, connection_record) -> None:
+    register_sqlite_functions(dbapi_connection)
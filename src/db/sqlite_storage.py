@@ -1,53 +1,200 @@
+import hashlib
 import os
+import queue
+import re
 import sqlite3
-from typing import Any, Dict, Union
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Union
 
 from chainlit import make_async
 from chainlit.data.storage_clients.base import BaseStorageClient
 from chainlit.logger import logger
 
+from src.utils.cache import LRUBytesCache
+
 service_host = os.getenv("SERVICE_HOST", "http://localhost:8000")
 
+STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "4"))
+BLOB_CHUNK_SIZE = int(os.getenv("BLOB_CHUNK_SIZE", str(64 * 1024)))
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """
+    Parse a single-range HTTP Range header.
+
+    Args:
+        range_header (str): The Range header value, e.g. "bytes=0-1023", "bytes=100-" or "bytes=-500".
+        size (int): Size of the blob in bytes.
+
+    Returns:
+        tuple: (start, end) with an inclusive end, or None to serve the whole blob
+        (no header, or a form this server does not handle such as multiple ranges).
+
+    Raises:
+        ValueError: If the range cannot be satisfied for this size.
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+BLOB_STORAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blob_objects (
+    hash TEXT PRIMARY KEY,
+    data BLOB,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS blob_refs (
+    object_key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES blob_objects (hash),
+    mime_type TEXT
+);
+"""
+
+
+def content_hash(data: bytes) -> str:
+    """Return the content address of a blob (hex SHA-256)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobInfo:
+    """Location and metadata of a stored blob."""
+
+    def __init__(self, rowid: int, size: int, mime_type: Optional[str], digest: str):
+        self.rowid = rowid
+        self.size = size
+        self.mime_type = mime_type or "application/octet-stream"
+        self.digest = digest
+
+    @property
+    def etag(self) -> str:
+        # Objects are content-addressed, so the hash identifies the bytes exactly
+        return f'"{self.digest}"'
+
+
 class SQLiteStorageClient(BaseStorageClient):
     """
-    Class to enable SQLite blob file storage with per-operation connections
+    Class to enable SQLite blob file storage with pooled connections.
+
+    Blobs are content-addressed: blob_objects holds each distinct content once, keyed
+    by its SHA-256 with a reference count, and blob_refs maps object keys to hashes.
+    Small blobs are served from an in-memory LRU cache keyed by hash, which never
+    goes stale since a hash always names the same bytes.
     """
 
-    def __init__(self, database_path: str):
+    def __init__(self, database_path: str, pool_size: int = STORAGE_POOL_SIZE,
+                 cache: Optional[LRUBytesCache] = None):
         self.database_path = database_path
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=max(1, pool_size))
+        self.cache = cache if cache is not None else LRUBytesCache()
         try:
-            # Initialize the database and create table if needed
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS blob_storage (
-                    object_key TEXT PRIMARY KEY,
-                    data BLOB,
-                    mime_type TEXT
-                )
-            """)
-            conn.commit()
-            cursor.close()
-            conn.close()
+            # Initialize the database and create tables if needed
+            with self._connection() as conn:
+                conn.executescript(BLOB_STORAGE_SCHEMA)
+                self._migrate_legacy_blobs(conn)
+                conn.commit()
             logger.info("SqliteStorageClient initialized")
         except Exception as e:
             logger.warning(f"SqliteStorageClient initialization error: {e}")
 
+    def _migrate_legacy_blobs(self, conn: sqlite3.Connection) -> None:
+        """Move rows of the pre-deduplication blob_storage table into blob_objects/blob_refs."""
+        legacy = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'blob_storage'"
+        ).fetchone()
+        if legacy is None:
+            return
+        moved = 0
+        # One row at a time, so large blobs are never all held in memory
+        for (rowid,) in conn.execute("SELECT rowid FROM blob_storage").fetchall():
+            object_key, data, mime_type = conn.execute(
+                "SELECT object_key, data, mime_type FROM blob_storage WHERE rowid = ?", (rowid,)
+            ).fetchone()
+            if data is None:
+                continue
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            self._put_ref(conn, object_key, data, mime_type)
+            moved += 1
+        conn.execute("DROP TABLE blob_storage")
+        logger.info(f"SqliteStorageClient migrated {moved} blobs to content-addressed storage")
+
+    @staticmethod
+    def _put_ref(conn: sqlite3.Connection, object_key: str, data: bytes, mime: Optional[str]) -> str:
+        """Point object_key at the content of data, storing the content if it is new."""
+        digest = content_hash(data)
+        old = conn.execute("SELECT hash FROM blob_refs WHERE object_key = ?", (object_key,)).fetchone()
+        if old is not None and old[0] == digest:
+            conn.execute("UPDATE blob_refs SET mime_type = ? WHERE object_key = ?", (mime, object_key))
+            return digest
+        # Only new content is written; a duplicate just gains a reference
+        if conn.execute("UPDATE blob_objects SET refcount = refcount + 1 WHERE hash = ?", (digest,)).rowcount == 0:
+            conn.execute(
+                "INSERT INTO blob_objects (hash, data, size, refcount) VALUES (?, ?, ?, 1)",
+                (digest, data, len(data)),
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO blob_refs (object_key, hash, mime_type) VALUES (?, ?, ?)",
+            (object_key, digest, mime),
+        )
+        if old is not None:
+            SQLiteStorageClient._release(conn, old[0])
+        return digest
+
+    @staticmethod
+    def _release(conn: sqlite3.Connection, digest: str) -> None:
+        """Drop one reference to an object, deleting it when none are left."""
+        conn.execute("UPDATE blob_objects SET refcount = refcount - 1 WHERE hash = ?", (digest,))
+        conn.execute("DELETE FROM blob_objects WHERE hash = ? AND refcount <= 0", (digest,))
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Check a connection out of the pool, opening one if the pool is empty."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            # Connections move between threadpool threads, one user at a time
+            conn = sqlite3.connect(self.database_path, check_same_thread=False)
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
     def sync_upload_file(self, object_key: str, data: Union[bytes, str], mime: str = "application/octet-stream") -> Dict[str, Any]:
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
             uuid = object_key.split('/')[0]
-            sql = "INSERT OR REPLACE INTO blob_storage (object_key, data, mime_type) VALUES (?, ?, ?)"
             if isinstance(data, str):
                 data = data.encode('utf-8')
-            cursor.execute(sql, (uuid, data, mime))
-            conn.commit()
-            
-            cursor.close()
-            conn.close()
-            
+            with self._connection() as conn:
+                # Take the write lock up front so the refcount read-modify-write is atomic
+                conn.execute("BEGIN IMMEDIATE")
+                digest = self._put_ref(conn, uuid, data, mime)
+                conn.commit()
+            self.cache.put(digest, data)
+
             url = f"{service_host}/blob/{uuid}"
             return {"object_key": object_key, "url": url}
         except Exception as e:
@@ -59,18 +206,18 @@ class SQLiteStorageClient(BaseStorageClient):
 
     def sync_download_file(self, object_key: str) -> str:
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            cursor.execute("SELECT data FROM blob_storage WHERE object_key = ?", (object_key,))
-            blob = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            if blob:
-                return blob[0]  # Return bytes directly
-            return ""
+            with self._connection() as conn:
+                ref = conn.execute("SELECT hash FROM blob_refs WHERE object_key = ?", (object_key,)).fetchone()
+                if not ref:
+                    return ""
+                data = self.cache.get(ref[0])
+                if data is None:
+                    blob = conn.execute("SELECT data FROM blob_objects WHERE hash = ?", (ref[0],)).fetchone()
+                    if not blob:
+                        return ""
+                    data = blob[0]
+                    self.cache.put(ref[0], data)
+            return data  # Return bytes directly
         except Exception as e:
             logger.warning(f"SqliteStorageClient, get_read_url error: {e}")
             return object_key
@@ -78,26 +225,88 @@ class SQLiteStorageClient(BaseStorageClient):
     async def download_file(self, object_key: str) -> str:
         return await make_async(self.sync_download_file)(object_key)
 
+    def sync_blob_info(self, object_key: str) -> Optional[BlobInfo]:
+        """
+        Look up a blob without reading its content.
+
+        Args:
+            object_key (str): The blob key.
+
+        Returns:
+            BlobInfo: rowid, size, mime type and hash, or None if the blob does not exist.
+        """
+        with self._connection() as conn:
+            row = conn.execute(
+                """SELECT o.rowid, o.size, r.mime_type, r.hash
+                   FROM blob_refs r JOIN blob_objects o ON o.hash = r.hash
+                   WHERE r.object_key = ?""",
+                (object_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return BlobInfo(*row)
+
+    async def blob_info(self, object_key: str) -> Optional[BlobInfo]:
+        return await make_async(self.sync_blob_info)(object_key)
+
+    def iter_blob(self, info: BlobInfo, start: int = 0, end: Optional[int] = None,
+                  chunk_size: int = BLOB_CHUNK_SIZE) -> Iterator[bytes]:
+        """
+        Read a blob in chunks, from the LRU cache for small blobs and with SQLite
+        incremental blob I/O otherwise.
+
+        Args:
+            info (BlobInfo): The blob, from sync_blob_info.
+            start (int): First byte to read.
+            end (int, optional): Last byte to read (inclusive); defaults to the end of the blob.
+            chunk_size (int): Bytes per chunk.
+
+        Yields:
+            bytes: Consecutive chunks of the requested range.
+        """
+        end = info.size - 1 if end is None else end
+        if info.size <= self.cache.max_item:
+            data = self.cache.get(info.digest)
+            if data is None:
+                with self._connection() as conn:
+                    row = conn.execute("SELECT data FROM blob_objects WHERE hash = ?", (info.digest,)).fetchone()
+                if row is None:
+                    return
+                data = row[0]
+                self.cache.put(info.digest, data)
+            for offset in range(start, end + 1, chunk_size):
+                yield data[offset:min(offset + chunk_size, end + 1)]
+            return
+        with self._connection() as conn:
+            with conn.blobopen("blob_objects", "data", info.rowid, readonly=True) as blob:
+                blob.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = blob.read(min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+
     async def get_read_url(self, object_key: str) -> str:
         uuid = object_key.split('/')[0]
         return f"{service_host}/blob/{uuid}"
 
     def sync_delete_file(self, object_key: str) -> bool:
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
             uuid = object_key.split('/')[0]
-            cursor.execute("DELETE FROM blob_storage WHERE object_key = ?", (uuid,))
-            conn.commit()
-            
-            cursor.close()
-            conn.close()
-            
+            with self._connection() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                ref = conn.execute("SELECT hash FROM blob_refs WHERE object_key = ?", (uuid,)).fetchone()
+                if ref is not None:
+                    conn.execute("DELETE FROM blob_refs WHERE object_key = ?", (uuid,))
+                    self._release(conn, ref[0])
+                conn.commit()
+
             return True
         except Exception as e:
             logger.warning(f"SqliteStorageClient, delete_file error: {e}")
             return False
 
     async def delete_file(self, object_key: str) -> bool:
-        return await make_async(self.sync_delete_file)(object_key)
\ No newline at end of file
+        return await make_async(self.sync_delete_file)(object_key)
@@ -3,17 +3,18 @@ import os
 import json
 import yaml
 from typing import Optional, List
-import pandas as pd
-from src.scan.cvss_score import generate_cvss, safe_cvss_score
+from src.scan.cvss_score import generate_rule_scores
 
-from src.scan.util import run_command_and_read_output, run_command_bg
+from src.scan.util import run_command_and_read_output, run_command_async, run_command_bg, intern_text, build_findings_frame, compact_json
 from prettytable import PrettyTable
 AWS_REPORT_PATH = "/tmp/trivy_aws_full.json"
 
 def scan_aws(
     region: str = "us-west-2",  # Path to scan; defaults to the current directory
     report: str = "/tmp/trivy_aws_result.json",  # Output file for scan results
-    bg: bool = False
+    bg: bool = False,
+    run_async: bool = False,  # Return an awaitable of the report path instead of running the scan
+    on_progress=None,  # Progress callback of the async run
 ):
     ###chainlit###
     # Construct the trivy command for scanning the filesystem
@@ -23,7 +24,10 @@ def scan_aws(
         "--format", "json",  # Set the output format to JSON
         "--output", report  # Specify the output file for the scan results
     ]
-    if bg:
+    if run_async:
+        # Streams Trivy's output and progress without blocking the event loop
+        result = run_command_async(command, report, on_progress=on_progress)
+    elif bg:
         result = run_command_bg(command)
     else:
         # Run the command and return the parsed output
@@ -79,9 +83,12 @@ def aws_short_table(report:dict):
 
     return table.get_string()
 
+AWS_FINDING_COLUMNS = ("type", "id", "resource_name", "service_name", "avdid", "title", "description",
+                       "resolution", "severity", "message", "cause_metadata")
+
 # Return dataframe from report
 def process_aws_scan(report: dict):
-    data = []
+    columns = {name: [] for name in AWS_FINDING_COLUMNS}
     for result in report["Results"]:
         misconfigurations = result.get("Misconfigurations", [])
         for misconfig in misconfigurations:
@@ -90,21 +97,18 @@ def process_aws_scan(report: dict):
                 cause_metadata.get("Provider", ""),
                 cause_metadata.get("Service", ""),
             )
-            service_name = cause_metadata.get("Service", "")
-            data.append({
-                "type": "AWS",
-                "id": misconfig.get("ID", ""),
-                "resource_name": resource_name,
-                "service_name": service_name,
-                "avdid": misconfig.get("AVDID", ""),
-                "title": misconfig.get("Title", ""),
-                "description": misconfig.get("Description", ""),
-                "resolution": misconfig.get("Resolution", ""),
-                "severity": misconfig.get("Severity", ""),
-                "message": misconfig.get("Message", ""),
-                "cause_metadata": json.dumps(cause_metadata)
-            })
-    df = pd.DataFrame(data)
+            columns["type"].append("AWS")
+            columns["id"].append(intern_text(misconfig.get("ID", "")))
+            columns["resource_name"].append(intern_text(resource_name))
+            columns["service_name"].append(cause_metadata.get("Service", ""))
+            columns["avdid"].append(intern_text(misconfig.get("AVDID", "")))
+            columns["title"].append(intern_text(misconfig.get("Title", "")))
+            columns["description"].append(intern_text(misconfig.get("Description", "")))
+            columns["resolution"].append(intern_text(misconfig.get("Resolution", "")))
+            columns["severity"].append(misconfig.get("Severity", ""))
+            columns["message"].append(intern_text(misconfig.get("Message", "")))
+            columns["cause_metadata"].append(compact_json(cause_metadata))
+    df = build_findings_frame(columns)
     # Deduplicate by id and resource name
     df = df.drop_duplicates(subset=["id", "resource_name"])
     return df
@@ -113,15 +117,8 @@ async def gen_aws_score(aws_df):
     sub_aws_df = aws_df[["avdid", "title", "description", "resolution", "severity", "message"]]
     sub_aws_df = sub_aws_df.drop_duplicates(subset=["avdid"])
 
-    # Generate CVSS strings asynchronously
-    cvss_strings = []
-    for _, row in sub_aws_df.iterrows():
-        cvss_strings.append(await generate_cvss(row))
-    sub_aws_df["cvss_strings"] = cvss_strings
-
-    # Calculate CVSS scores
-    sub_aws_df["risk_score"] = sub_aws_df["cvss_strings"].apply(safe_cvss_score)
-    return sub_aws_df
+    # Score from the CVSS catalog, falling back to the LLM for unknown rules
+    return await generate_rule_scores(sub_aws_df)
 
 # Combine the aws scan results with the CVSS scores
 async def gen_aws_db_content(aws_report, cols):
@@ -4,32 +4,88 @@ from typing import Optional
 import yaml
 import asyncio
 import csv
-from langchain_openai import ChatOpenAI
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 
-from src.utils.utils import reasoning_prompt, load_chat_model, read_file_prompt
+from src.utils.utils import reasoning_prompt, get_chat_model, static_prompt, log_cache_usage
+from src.utils.llm_gateway import PRIORITY_BACKGROUND
+from src.scan.cvss_vectorized import cvss3_base_scores
 
 import pandas as pd
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
-from cvss import CVSS2, CVSS3, CVSS4
 
-model = load_chat_model()
+# Reviewed CVSS vectors of known Trivy misconfiguration rules, keyed by AVDID
+CVSS_CATALOG_PATH = os.environ.get("CVSS_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cvss_catalog.json"))
+
+# Scoring model, created on first use; may be replaced, e.g. by a stub in benchmarks
+model = None
+
+def get_scoring_model():
+    """Return the scoring model. Background scoring yields to interactive chat requests."""
+    global model
+    if model is None:
+        model = get_chat_model("scoring", PRIORITY_BACKGROUND)
+    return model
 
 # Function to generate CVSS strings asynchronously
 async def generate_cvss(row):
     try:
+        # The scoring guidelines precede the issue, so only the issue varies between calls
         content = reasoning_prompt("./src/prompts/issue_scoring_prompt.txt", ISSUE_DESCRIPTION=json.dumps(row.to_dict()))
-        local_messages = SystemMessage(content=read_file_prompt("./src/prompts/cybersecurity_system_prompt.txt")), HumanMessage(content=content)
-        response = await model.ainvoke(local_messages)
+        local_messages = SystemMessage(content=static_prompt("./src/prompts/cybersecurity_system_prompt.txt")), HumanMessage(content=content)
+        response = await get_scoring_model().ainvoke(local_messages)
+        log_cache_usage("scoring", response)
         return response.content
     except Exception as e:
         print(f"Error generating CVSS string for row: {row.to_dict()}. Error: {e}")
         return None
 
-# Function to calculate CVSS scores with error handling
-def safe_cvss_score(cvss_string):
+def load_cvss_catalog(path: str = CVSS_CATALOG_PATH) -> dict:
+    """
+    Load the reviewed CVSS catalog of misconfiguration rules.
+
+    Args:
+        path (str): Path to the catalog JSON file.
+
+    Returns:
+        dict: AVDID -> {"vector": str, "score": float}; empty if the catalog is missing or invalid.
+    """
     try:
-        return CVSS3(cvss_string).scores()[0] if cvss_string else None
-    except Exception as e:
-        print(f"Error processing CVSS string: {cvss_string}. Error: {e}")
-        return None
+        with open(path, "r", encoding="utf-8") as file:
+            catalog = json.load(file)
+        print(f"Loaded CVSS catalog version {catalog.get('version')} with {len(catalog.get('rules', {}))} rules")
+        return catalog.get("rules", {})
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error loading CVSS catalog {path}: {e}")
+        return {}
+
+CVSS_CATALOG = load_cvss_catalog()
+
+async def generate_rule_scores(rules_df):
+    """
+    Attach cvss_strings and risk_score to one row per rule.
+    Rules in the catalog are scored from it, only unknown rules are sent to the LLM.
+
+    Args:
+        rules_df (pd.DataFrame): Rules with avdid, title, description, resolution, severity and message columns.
+
+    Returns:
+        pd.DataFrame: The rules with cvss_strings and risk_score columns.
+    """
+    rules_df = rules_df.copy()
+    cvss_strings, risk_scores = [], []
+    llm_count = 0
+    for _, row in rules_df.iterrows():
+        prior = CVSS_CATALOG.get(row["avdid"])
+        if prior:
+            cvss_strings.append(prior["vector"])
+            risk_scores.append(prior["score"])
+        else:
+            cvss_strings.append(await generate_cvss(row))
+            risk_scores.append(None)
+            llm_count += 1
+    print(f"Scored {len(rules_df)} rules, {len(rules_df) - llm_count} from catalog, {llm_count} by LLM")
+    rules_df["cvss_strings"] = cvss_strings
+    # Catalog scores are precomputed, LLM vectors are scored in one vectorized pass
+    rules_df["risk_score"] = pd.Series(risk_scores, index=rules_df.index, dtype=float).fillna(
+        cvss3_base_scores(rules_df["cvss_strings"])
+    )
+    return rules_df
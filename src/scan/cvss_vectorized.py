@@ -0,0 +1,108 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# CVSS v3.x base metric weights (CVSS v3.1 specification, section 7.4)
+BASE_METRIC_WEIGHTS = {
+    "AV": {"N": 0.85, "A": 0.62, "L": 0.55, "P": 0.2},
+    "AC": {"L": 0.77, "H": 0.44},
+    "PR": {"N": 0.85, "L": 0.62, "H": 0.27},
+    "UI": {"N": 0.85, "R": 0.62},
+    "S": {"U": 0.0, "C": 1.0},
+    "C": {"H": 0.56, "L": 0.22, "N": 0.0},
+    "I": {"H": 0.56, "L": 0.22, "N": 0.0},
+    "A": {"H": 0.56, "L": 0.22, "N": 0.0},
+}
+# Privileges Required weights when Scope is Changed
+PR_SCOPE_CHANGED_WEIGHTS = {"N": 0.85, "L": 0.68, "H": 0.5}
+
+VECTOR_PREFIX_PATTERN = r"^CVSS:3\.[01]/"
+
+
+def round_up(values: np.ndarray) -> np.ndarray:
+    """
+    CVSS v3.1 Roundup: the smallest number with one decimal place that is equal to or
+    higher than the input, computed on integers to absorb floating point error.
+    """
+    int_input = np.round(values * 100000)
+    return np.where(
+        int_input % 10000 == 0,
+        int_input / 100000.0,
+        (np.floor(int_input / 10000) + 1) / 10.0,
+    )
+
+
+def parse_cvss3_vectors(vectors: pd.Series) -> pd.DataFrame:
+    """
+    Split CVSS 3.x vector strings into one column per base metric.
+
+    Args:
+        vectors (pd.Series): CVSS vector strings.
+
+    Returns:
+        pd.DataFrame: Metric value letters (AV, AC, PR, UI, S, C, I, A); NaN where a metric is missing
+        or the vector is not a CVSS 3.x vector.
+    """
+    vectors = vectors.astype("string").str.strip()
+    valid = vectors.str.contains(VECTOR_PREFIX_PATTERN, regex=True).fillna(False).astype(bool)
+    metrics = {}
+    for metric, weights in BASE_METRIC_WEIGHTS.items():
+        pattern = rf"/{metric}:([{''.join(weights)}])(?:/|$)"
+        metrics[metric] = vectors.str.extract(pattern, expand=False).where(valid)
+    return pd.DataFrame(metrics, index=vectors.index)
+
+
+def _base_scores_from_metrics(metrics: pd.DataFrame) -> np.ndarray:
+    weights = {
+        metric: metrics[metric].map(values).to_numpy(dtype=float, na_value=np.nan)
+        for metric, values in BASE_METRIC_WEIGHTS.items()
+    }
+    changed = weights["S"] == 1.0
+    pr = np.where(
+        changed,
+        metrics["PR"].map(PR_SCOPE_CHANGED_WEIGHTS).to_numpy(dtype=float, na_value=np.nan),
+        weights["PR"],
+    )
+
+    isc_base = 1 - (1 - weights["C"]) * (1 - weights["I"]) * (1 - weights["A"])
+    impact = np.where(
+        changed,
+        7.52 * (isc_base - 0.029) - 3.25 * (isc_base - 0.02) ** 15,
+        6.42 * isc_base,
+    )
+    exploitability = 8.22 * weights["AV"] * weights["AC"] * pr * weights["UI"]
+
+    total = np.where(changed, 1.08 * (impact + exploitability), impact + exploitability)
+    scores = np.where(impact <= 0, 0.0, round_up(np.minimum(total, 10.0)))
+    # Any missing metric leaves NaN weights, which propagate to the score
+    return np.where(np.isnan(total), np.nan, scores)
+
+
+def cvss3_base_scores(vectors) -> pd.Series:
+    """
+    Compute CVSS 3.x base scores for many vectors at once.
+    Each distinct vector is parsed and scored once and the result is broadcast back.
+
+    Args:
+        vectors (pd.Series or list): CVSS vector strings.
+
+    Returns:
+        pd.Series: Base scores aligned with the input, NaN for invalid vectors.
+    """
+    vectors = pd.Series(vectors) if not isinstance(vectors, pd.Series) else vectors
+    codes, uniques = pd.factorize(vectors, use_na_sentinel=True)
+    if len(uniques) == 0:
+        return pd.Series(np.nan, index=vectors.index, dtype=float)
+    unique_scores = _base_scores_from_metrics(parse_cvss3_vectors(pd.Series(uniques)))
+    scores = np.where(codes >= 0, unique_scores[np.maximum(codes, 0)], np.nan)
+    return pd.Series(scores, index=vectors.index, dtype=float)
+
+
+def all_base_vectors(prefix: str = "CVSS:3.1") -> list:
+    """Return every combination of CVSS 3.x base metric values (2,592 vectors)."""
+    metrics = list(BASE_METRIC_WEIGHTS)
+    return [
+        prefix + "".join(f"/{metric}:{value}" for metric, value in zip(metrics, values))
+        for values in itertools.product(*(BASE_METRIC_WEIGHTS[m] for m in metrics))
+    ]
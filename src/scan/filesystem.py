@@ -5,7 +5,10 @@ from typing import Optional, List
 from prettytable import PrettyTable
 import pandas as pd
 
-from src.scan.util import run_command_and_read_output, get_severity, run_command_bg
+from src.scan.util import run_command_and_read_output, run_command_async, get_severity, run_command_bg, intern_text, build_findings_frame
+
+FINDING_COLUMNS = ("type", "id", "resource_name", "service_name", "avdid", "title", "description",
+                   "resolution", "severity", "message", "cvss_strings", "risk_score", "cause_metadata")
 
 FS_REPORT_PATH = "/tmp/trivy_code_full.json"
 
@@ -17,6 +20,8 @@ def scan_filesystem(
     ] = [],  # Scanners to use; defaults to vuln, secret, and misconfig
     severity_level: str = "HIGH",  # Minimum severity level to include in the report
     bg: bool = False,
+    run_async: bool = False,  # Return an awaitable of the report path instead of running the scan
+    on_progress=None,  # Progress callback of the async run
 ):
     ###chainlit###
     if not os.path.isdir(path):
@@ -48,7 +53,10 @@ def scan_filesystem(
     ]
     print(command)
     # Run the command and return the parsed output
-    if bg:
+    if run_async:
+        # Streams Trivy's output and progress without blocking the event loop
+        result = run_command_async(command, report, on_progress=on_progress)
+    elif bg:
         result = run_command_bg(command)
     else:
         result = run_command_and_read_output(command=command, output_file=report)
@@ -182,11 +190,13 @@ def get_purl_or_pkgid(data):
         return data['PkgID']
 
 async def process_code_scan(report: dict, type="CODE"):
-    data = []
+    columns = {name: [] for name in FINDING_COLUMNS}
     for result in report["Results"]:
-        target = result.get("Target", "")
+        target = intern_text(result.get("Target", ""))
         vulnerabilities = result.get("Vulnerabilities", [])
         for vul in vulnerabilities:
+            risk_score = 0
+            cvss_strings = ""
             if "CVSS" in vul:
                 if "nvd" in vul["CVSS"]:
                     risk_score = vul["CVSS"]["nvd"].get("V3Score", 0)
@@ -197,21 +207,18 @@ async def process_code_scan(report: dict, type="CODE"):
                 elif "redhat" in vul["CVSS"]:
                     risk_score = vul["CVSS"]["redhat"].get("V3Score", 0)
                     cvss_strings = vul["CVSS"]["redhat"].get("V3Vector", "")
-            data.append({
-                "type": type,
-                "id": vul.get("VulnerabilityID", ""),
-                "resource_name": get_purl_or_pkgid(vul),
-                "service_name": "general",
-                "avdid": "",
-                "title": vul.get("Title", ""),
-                "description": vul.get("Description", ""),
-                "resolution": f"Update to {vul.get('FixedVersion', 'NA')}",
-                "severity": vul.get("Severity", ""),
-                "message": "",
-                "cvss_strings": cvss_strings,
-                "risk_score": risk_score,
-                "cause_metadata": target
-            })
-
-    df = pd.DataFrame(data)
-    return df
+            columns["type"].append(type)
+            columns["id"].append(intern_text(vul.get("VulnerabilityID", "")))
+            columns["resource_name"].append(intern_text(get_purl_or_pkgid(vul)))
+            columns["service_name"].append("general")
+            columns["avdid"].append("")
+            columns["title"].append(intern_text(vul.get("Title", "")))
+            columns["description"].append(intern_text(vul.get("Description", "")))
+            columns["resolution"].append(intern_text(f"Update to {vul.get('FixedVersion', 'NA')}"))
+            columns["severity"].append(vul.get("Severity", ""))
+            columns["message"].append("")
+            columns["cvss_strings"].append(intern_text(cvss_strings))
+            columns["risk_score"].append(risk_score)
+            columns["cause_metadata"].append(target)
+
+    return build_findings_frame(columns)
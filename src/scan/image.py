@@ -6,7 +6,7 @@ from typing import Optional, List
 from prettytable import PrettyTable
 import pandas as pd
 
-from src.scan.util import run_command_and_read_output, get_severity, run_command_bg
+from src.scan.util import run_command_and_read_output, run_command_async, get_severity, run_command_bg
 
 IMAGE_REPORT_PATH = "/tmp/trivy_container_full.json"
 DOCKER_HOST = os.environ.get("DOCKER_HOST", "unix:///var/run/docker.sock")
@@ -19,6 +19,8 @@ def scan_image(
     ] = [],  # Scanners to use; defaults to vuln, secret, and misconfig
     severity_level: str = "HIGH",  # Minimum severity level to include in the report
     bg: bool = False,  # Run the scan in the background (default: False)
+    run_async: bool = False,  # Return an awaitable of the report path instead of running the scan
+    on_progress=None,  # Progress callback of the async run
 ):
     ###chainlit###
     if not os.path.exists(image_path):
@@ -50,7 +52,10 @@ def scan_image(
 
     print(command)
     # Run the command and return the parsed output
-    if bg:
+    if run_async:
+        # Streams Trivy's output and progress without blocking the event loop
+        result = run_command_async(command, report, on_progress=on_progress)
+    elif bg:
         result = run_command_bg(command)
     else:
         result = run_command_and_read_output(command=command, output_file=report)
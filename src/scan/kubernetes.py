@@ -1,19 +1,22 @@
+import asyncio
 import yaml
 import json
 import os
+import shutil
+import subprocess
+import tempfile
+from typing import Optional
 from importlib import resources
 from prettytable import PrettyTable
-from src.scan.util import run_command_and_read_output, NoOutputError, filter_severity, count_gpt_tokens, run_command_bg
-import pandas as pd
+from src.scan.util import run_command_and_read_output, run_command_async, NoOutputError, filter_severity, count_gpt_tokens, run_command_bg
+from src.scan.util import SCAN_MAX_CONCURRENCY
+from src.scan.util import intern_text, build_findings_frame, compact_json, EMPTY_CAUSE_METADATA
 from tqdm import tqdm
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from src.scan.util import sanitize_input, count_gpt_tokens
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
 import logging
-import uvicorn
-from cvss_score import generate_cvss, safe_cvss_score
+from src.scan.cvss_score import generate_rule_scores
 
 logger = logging.getLogger('uvicorn.error')
 ISSUE_SCORING_PROMPT_PATH = "issue_scoring_prompt.txt"
@@ -26,11 +29,9 @@ def count_key_value_in_list_compact(dicts, key, value):
     return sum(1 for d in dicts if d.get(key) == value)
 
 def read_k8s_full_report():
-    with open(K8S_REPORT_PATH, "r") as file:
-        try:
-            return json.load(file)
-        except json.JSONDecodeError:
-            raise JSONParseError(output_file)
+    # Trivy output at K8S_REPORT_PATH is moved into the compressed result store on read
+    from src.scan.scan_result import ScanResult
+    return ScanResult(base_dir=os.path.dirname(os.path.dirname(K8S_REPORT_PATH))).get_scan_result("kubernetes")
 
 def k8s_resource_misconfigure(report:dict, resource:str):
     cluster_name = report["ClusterName"]
@@ -122,17 +123,18 @@ def get_kubernetes_resource(name: dict)-> str:
     report = read_k8s_full_report()
     return k8s_resource_misconfigure(report, name)
 ""
-def scan_kubernetes(report: str = K8S_REPORT_PATH, config_path:str = "./kube/config", bg:bool = False):
-    ###chainlit###
-    if os.path.exists(report):
-        return True, f"Detect existing report under {report}"
+def k8s_scan_command(report: str, config_path: str, qps: int = 40, timeout: str = "2h", extra_args: tuple = ()) -> list:
+    """
+    Build the trivy k8s command.
 
-    if not os.path.exists(config_path):
-        print(f"Error: The folder '{config_path}' does not exist.")
-        return False
-  
-    # Construct the trivy command for scanning the kubernetes
-    command = [
+    :param report: Output file for the scan results.
+    :param config_path: Path of the kubeconfig.
+    :param qps: Kubernetes API queries per second allowed to Trivy.
+    :param timeout: Trivy scan timeout, e.g. "2h" or "1800s".
+    :param extra_args: Further arguments, e.g. namespace selection.
+    :return: The command as a list.
+    """
+    return [
         "trivy",
         "k8s",
         "--report",
@@ -141,59 +143,261 @@ def scan_kubernetes(report: str = K8S_REPORT_PATH, config_path:str = "./kube/con
         "public.ecr.aws/aquasecurity/trivy-db",
         "--disable-node-collector",
         "--timeout",
-        "2h",
+        timeout,
         "--skip-images",
         "--kubeconfig" if config_path else "",
         config_path,
         "--qps",
-        "40",
+        str(qps),
+        *extra_args,
         "--format",
         "json",
         "--output",
         report  # Specify the output file for the scan results
     ]
 
+def scan_kubernetes(report: str = K8S_REPORT_PATH, config_path:str = "./kube/config", bg:bool = False, run_async: bool = False, on_progress=None):
+    ###chainlit###
+    if os.path.exists(report):
+        return True, f"Detect existing report under {report}"
+
+    if not os.path.exists(config_path):
+        print(f"Error: The folder '{config_path}' does not exist.")
+        return False
+  
+    # Construct the trivy command for scanning the kubernetes
+    command = k8s_scan_command(report, config_path)
+
     # Run the command and return the parsed output
-    if bg:
+    if run_async:
+        # Streams Trivy's output and progress without blocking the event loop
+        result = run_command_async(command, report, on_progress=on_progress)
+    elif bg:
         result = run_command_bg(command)
     else:
         result= run_command_and_read_output(command=command, output_file=report)
     return result
 
 
+#-------------------------------
+# Sharded scan
+#-------------------------------
+# Shards of one scan running at the same time; all Trivy processes together are also
+# limited by SCAN_MAX_CONCURRENCY
+K8S_SHARD_WORKERS = int(os.getenv("K8S_SHARD_WORKERS", "4"))
+# Kubernetes API budget shared by the running shards, as the single cluster scan used
+K8S_SCAN_QPS = int(os.getenv("K8S_SCAN_QPS", "40"))
+K8S_SHARD_TIMEOUT = int(os.getenv("K8S_SHARD_TIMEOUT", "1800"))  # seconds per shard attempt
+K8S_SHARD_RETRIES = int(os.getenv("K8S_SHARD_RETRIES", "2"))
+# Component name of the shard holding cluster-scoped resources
+K8S_CLUSTER_SHARD = "_cluster"
+# Kinds scanned by the cluster shard; the namespace shards cover all namespaced kinds
+K8S_CLUSTER_SCOPED_KINDS = (
+    "Node", "Namespace", "ClusterRole", "ClusterRoleBinding", "PersistentVolume", "StorageClass",
+    "CustomResourceDefinition", "MutatingWebhookConfiguration", "ValidatingWebhookConfiguration",
+    "APIService", "IngressClass", "PriorityClass", "RuntimeClass", "PodSecurityPolicy",
+)
+# Result store holding the latest report of each shard, next to the merged "default" report
+K8S_SHARD_STORE = "shards"
+
+def list_namespaces(config_path: str) -> list:
+    """
+    List the namespaces of the cluster with kubectl.
+
+    :param config_path: Path of the kubeconfig.
+    :return: Namespace names, sorted.
+    """
+    command = ["kubectl", "get", "namespaces", "-o", "jsonpath={.items[*].metadata.name}"]
+    if config_path:
+        command += ["--kubeconfig", config_path]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True, timeout=120)
+    return sorted(result.stdout.split())
+
+def k8s_shards(namespaces: list) -> dict:
+    """
+    Split a cluster scan into one shard per namespace and one for cluster-scoped resources.
+    Namespaces created after the listing are scanned by the next run.
+
+    :param namespaces: Namespace names.
+    :return: Mapping of shard name to the extra trivy arguments selecting it.
+    """
+    shards = {namespace: ("--include-namespaces", namespace) for namespace in namespaces}
+    shards[K8S_CLUSTER_SHARD] = ("--include-kinds", ",".join(K8S_CLUSTER_SCOPED_KINDS))
+    return shards
+
+def k8s_shard_report(report: dict, shard: str) -> dict:
+    """
+    Extract the resources of one shard from a cluster report, sharded or not.
+
+    :param report: A trivy k8s report.
+    :param shard: A namespace, or K8S_CLUSTER_SHARD for cluster-scoped resources.
+    :return: A report with the shard's resources only.
+    """
+    namespace = "" if shard == K8S_CLUSTER_SHARD else shard
+    return {
+        "ClusterName": report.get("ClusterName", ""),
+        "Resources": [resource for resource in report.get("Resources") or []
+                      if (resource.get("Namespace") or "") == namespace],
+    }
+
+def merge_k8s_reports(reports: list) -> dict:
+    """
+    Merge trivy k8s reports of shards into one report, as consumed by process_k8s_scan.
+
+    :param reports: Shard reports.
+    :return: A report with the cluster name and the resources of all shards; a resource
+             reported by several shards is kept once.
+    """
+    merged = {"ClusterName": "", "Resources": []}
+    seen = set()
+    for report in reports:
+        if not merged["ClusterName"] and report.get("ClusterName"):
+            merged["ClusterName"] = report["ClusterName"]
+        for resource in report.get("Resources") or []:
+            # Cluster-scoped resources come with a null or a missing namespace
+            key = (resource.get("Namespace") or "", resource.get("Kind"), resource.get("Name"))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged["Resources"].append(resource)
+    return merged
+
+async def scan_k8s_shard(shard: str, extra_args: tuple, workdir: str, config_path: str, qps: int,
+                         semaphore: asyncio.Semaphore, retries: int = K8S_SHARD_RETRIES,
+                         timeout: int = K8S_SHARD_TIMEOUT, on_progress=None) -> dict:
+    """
+    Scan one shard, retrying failed attempts with backoff.
+    Each attempt holds a slot of semaphore (the scan's workers) and of the shared scanner limit.
+
+    :return: The shard report.
+    :raises Exception: The error of the last attempt.
+    """
+    report = os.path.join(workdir, f"{shard}.json")
+    command = k8s_scan_command(report, config_path, qps=qps, timeout=f"{timeout}s", extra_args=extra_args)
+    for attempt in range(retries + 1):
+        try:
+            # Trivy stops itself at --timeout; the process is killed shortly after if it does not
+            async with semaphore:
+                await run_command_async(command, report, timeout=timeout + 60, on_progress=on_progress,
+                                        on_output=lambda line: print(f"[{shard}] {line}"))
+            with open(report, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, NoOutputError, json.JSONDecodeError) as e:
+            if attempt == retries:
+                raise
+            delay = 2 ** attempt * 5
+            print(f"Shard {shard} attempt {attempt + 1} failed ({type(e).__name__}), retrying in {delay}s")
+            await asyncio.sleep(delay)
+        finally:
+            if os.path.exists(report):
+                os.remove(report)
+
+async def scan_kubernetes_sharded(scan_result, config_path: str = "./kube/config", namespaces: Optional[list] = None,
+                                  workers: int = K8S_SHARD_WORKERS, qps: int = K8S_SCAN_QPS,
+                                  retries: int = K8S_SHARD_RETRIES, on_progress=None) -> dict:
+    """
+    Scan a cluster one namespace at a time, in parallel, and store the merged report.
+
+    Each shard runs trivy k8s with its share of the API budget (qps divided by the shards
+    that can run at once, at most SCAN_MAX_CONCURRENCY). Shard reports are stored as
+    components of the kubernetes "shards" result, then merged into the kubernetes
+    "default" result read by scan_import. A shard that still fails after its retries is
+    replaced by its previous stored report, or by its resources in the previous "default"
+    report (e.g. of an unsharded scan), so that its findings are not recorded as fixed.
+
+    :param scan_result: The ScanResult holding the results.
+    :param config_path: Path of the kubeconfig.
+    :param namespaces: Namespaces to scan, listed with kubectl when None.
+    :param workers: Shards scanned at the same time.
+    :param qps: Kubernetes API queries per second of all running shards together.
+    :param retries: Retries of a failed shard.
+    :param on_progress: Called with the ScanProgress updates of the shards.
+    :return: Summary with the shard count, the failed and stale shards and the number of resources.
+    """
+    if namespaces is None:
+        namespaces = list_namespaces(config_path)
+    shards = k8s_shards(namespaces)
+    running = max(1, min(workers, SCAN_MAX_CONCURRENCY))
+    shard_qps = max(1, qps // running)
+    semaphore = asyncio.Semaphore(max(1, workers))
+    workdir = tempfile.mkdtemp(prefix="k8s-shards-", dir=scan_result.base_dir)
+    print(f"Scanning {len(shards)} Kubernetes shards, {running} at a time at {shard_qps} QPS each")
+
+    async def run(shard, extra_args):
+        report = await scan_k8s_shard(shard, extra_args, workdir, config_path, shard_qps, semaphore,
+                                      retries=retries, on_progress=on_progress)
+        # Stored as soon as it is done, so a later failure does not lose it
+        scan_result.set_scan_result("kubernetes", K8S_SHARD_STORE, report, component_name=shard)
+        return report
+
+    try:
+        results = await asyncio.gather(*(run(shard, args) for shard, args in shards.items()), return_exceptions=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    reports, failed, stale = [], [], []
+    previous_default = None
+    for shard, result in zip(shards, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if not isinstance(result, BaseException):
+            reports.append(result)
+            continue
+        print(f"Shard {shard} failed: {result!r}")
+        failed.append(shard)
+        previous = scan_result.get_scan_result("kubernetes", K8S_SHARD_STORE, component_name=shard)
+        if previous is None:
+            # No shard report yet, e.g. on the first sharded scan: take the shard's
+            # resources from the previous merged or unsharded report
+            if previous_default is None:
+                previous_default = scan_result.get_scan_result("kubernetes") or {}
+            if previous_default:
+                previous = k8s_shard_report(previous_default, shard)
+        if previous is not None:
+            reports.append(previous)
+            stale.append(shard)
+
+    merged = merge_k8s_reports(reports)
+    if reports:
+        scan_result.set_scan_result("kubernetes", "default", merged)
+    summary = {"shards": len(shards), "failed": failed, "stale": stale, "resources": len(merged["Resources"])}
+    print(f"Kubernetes sharded scan: {summary}")
+    return summary
+
 ###CHAINLIT###
 # Group the k8s scan results with the option to include/exclude metadata
+K8S_FINDING_COLUMNS = ("type", "id", "resource_name", "service_name", "avdid", "title", "description",
+                       "resolution", "severity", "message", "cause_metadata")
+
 def process_k8s_scan(k8s_report_data, exclude_metadata=True, grouping=True):
-    # Extract rows
-    rows = []
+    # Extract rows into per-column lists
+    columns = {name: [] for name in K8S_FINDING_COLUMNS}
     for resource in k8s_report_data["Resources"]:
         kind = resource["Kind"]
-        name = resource["Name"]
+        name = intern_text(resource["Name"])
         for result in resource.get("Results", []):
             if result["MisconfSummary"]["Failures"] > 0:
                 for misconf in result.get("Misconfigurations", []):
-                    cause_metadata = misconf.get("CauseMetadata", {})
-                    
-                    # Conditionally remove 'Code' key from CauseMetadata
+                    # Conditionally drop CauseMetadata (including its 'Code' lines)
                     if exclude_metadata:
-                        cause_metadata = {}
-                    
-                    rows.append({
-                        "type": "KUBERNETES",
-                        "id": misconf["ID"],
-                        "resource_name": name,
-                        "service_name": "general",
-                        "avdid": misconf["AVDID"],
-                        "title": misconf["Title"],
-                        "description": misconf["Description"],
-                        "resolution": misconf["Resolution"],
-                        "severity": misconf["Severity"],
-                        "message": misconf["Message"],
-                        "cause_metadata": json.dumps(cause_metadata)
-                    })
+                        cause_metadata = EMPTY_CAUSE_METADATA
+                    else:
+                        cause_metadata = compact_json(misconf.get("CauseMetadata", {}))
+
+                    columns["type"].append("KUBERNETES")
+                    columns["id"].append(intern_text(misconf["ID"]))
+                    columns["resource_name"].append(name)
+                    columns["service_name"].append("general")
+                    columns["avdid"].append(intern_text(misconf["AVDID"]))
+                    columns["title"].append(intern_text(misconf["Title"]))
+                    columns["description"].append(intern_text(misconf["Description"]))
+                    columns["resolution"].append(intern_text(misconf["Resolution"]))
+                    columns["severity"].append(misconf["Severity"])
+                    columns["message"].append(intern_text(misconf["Message"]))
+                    columns["cause_metadata"].append(cause_metadata)
 
     # Create a pandas DataFrame
-    df = pd.DataFrame(rows)
+    df = build_findings_frame(columns)
     if not grouping:
         return df
 
@@ -201,7 +405,8 @@ def process_k8s_scan(k8s_report_data, exclude_metadata=True, grouping=True):
     grouped_df = (
         df.groupby(
             ["kind", "type", "id", "avdid", "title", "description", "resolution", "severity"],
-            as_index=False
+            as_index=False,
+            observed=True
         )
         .agg(Details=("resource_name", lambda x: [
             {"resource_name": name, "message": msg, "cause_metadata": cm} 
@@ -215,15 +420,8 @@ async def gen_k8s_score(k8s_df):
     sub_k8s_df = k8s_df[["avdid", "title", "description", "resolution", "severity", "message"]]
     sub_k8s_df = sub_k8s_df.drop_duplicates(subset=["avdid"])
 
-    # Generate CVSS strings asynchronously
-    cvss_strings = []
-    for _, row in sub_k8s_df.iterrows():
-        cvss_strings.append(await generate_cvss(row))
-    sub_k8s_df["cvss_strings"] = cvss_strings
-
-    # Calculate CVSS scores
-    sub_k8s_df["risk_score"] = sub_k8s_df["cvss_strings"].apply(safe_cvss_score)
-    return sub_k8s_df
+    # Score from the CVSS catalog, falling back to the LLM for unknown rules
+    return await generate_rule_scores(sub_k8s_df)
 
 # Combine the k8s scan results with the CVSS scores
 async def gen_kubernetes_db_content(k8s_report, cols):
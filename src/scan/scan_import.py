@@ -1,14 +1,32 @@
-from src.db.db_util import init_db, batch_upsert_records, query_all_records, export_to_csv
+from src.db.db_util import init_db, batch_upsert_records, delete_unused_rules, record_scan_run, query_all_records, export_to_csv
+import argparse
 import asyncio
+import os
 from src.scan.scan_result import ScanResult
 from src.db.config import DEFAULT_DB_PATH
+from src.db.snapshot import SnapshotBuilder
 from src.scan.kubernetes import gen_kubernetes_db_content
 from src.scan.filesystem import process_code_scan
 from src.scan.aws import gen_aws_db_content
+from src.utils.profiling import profile_run
 
-async def process_and_upsert_scan_results(scan_type: str, scan_result: ScanResult, db_cols: list, process_func=None, **kwargs):
+# "atomic" builds a complete snapshot in staging tables and publishes it in one transaction,
+# "upsert" writes each scan type into the live tables as it is processed
+SCAN_IMPORT_MODE = os.getenv("SCAN_IMPORT_MODE", "atomic")
+
+DB_COLS = ['type', 'id', 'resource_name', 'service_name', 'avdid', 'title', 'description', 'resolution', 'severity', 'message', 'cvss_strings', 'risk_score', 'cause_metadata']
+
+# Scan type, record type and custom processing function of each imported report
+SCAN_TYPES = [
+    ("kubernetes", "KUBERNETES", None),
+    ("aws", "AWS", None),
+    ("code", "CODE", process_code_scan),
+    ("container", "CONTAINER", process_code_scan),
+]
+
+async def build_scan_records(scan_type: str, scan_result: ScanResult, db_cols: list, process_func=None, **kwargs):
     """
-    Process scan results, generate database content, and upsert records.
+    Process a scan report into database records.
 
     Args:
         scan_type (str): The type of scan (e.g., "kubernetes", "aws").
@@ -18,36 +36,113 @@ async def process_and_upsert_scan_results(scan_type: str, scan_result: ScanResul
         **kwargs: Additional arguments for the processing function.
 
     Returns:
-        list: Upserted records.
+        list: Records with the results columns, or None when there is no report.
     """
     report = scan_result.get_scan_result(scan_type)
     if report == None:
         return None
+    if process_func:
+        df = await process_func(report, **kwargs)
+    else:
+        print("generate db content===================")
+        df = await globals()[f"gen_{scan_type}_db_content"](report, db_cols)
+    return df.to_dict(orient="records")
+
+async def process_and_upsert_scan_results(scan_type: str, scan_result: ScanResult, db_cols: list, process_func=None, **kwargs):
+    """
+    Process scan results, generate database content, and upsert records.
+
+    Args:
+        scan_type (str): The type of scan (e.g., "kubernetes", "aws").
+        scan_result (ScanResult): The ScanResult object to retrieve results.
+        db_cols (list): List of database columns.
+        process_func (callable, optional): Custom processing function for the scan results.
+        **kwargs: Additional arguments for the processing function.
+
+    Returns:
+        int: Number of upserted records.
+    """
     try:
-        if process_func:
-            df = await process_func(report, **kwargs)
-        else:
-            print("generate db content===================")
-            df = await globals()[f"gen_{scan_type}_db_content"](report, db_cols)
-        rows = df.to_dict(orient="records")
-        return await batch_upsert_records(rows)
+        rows = await build_scan_records(scan_type, scan_result, db_cols, process_func, **kwargs)
+        if rows is None:
+            return None
+        upserted = await batch_upsert_records(rows)
+        await record_scan_run(rows, [kwargs.get("type", scan_type.upper())])
+        return upserted
     except Exception as e:
         print(e)
         return None
 
-async def initialize_database_and_scans():
-    """Initialize the database, process scan results, and export records to CSV."""
-    # Use the consistent absolute path
-    await init_db(DEFAULT_DB_PATH)
-    
-    db_cols = ['type', 'id', 'resource_name', 'service_name', 'avdid', 'title', 'description', 'resolution', 'severity', 'message', 'cvss_strings', 'risk_score', 'cause_metadata']
-    scan_result = ScanResult()
+async def import_snapshot(scan_result: ScanResult, db_cols: list, db_path: str = DEFAULT_DB_PATH):
+    """
+    Import all scan types into staging tables and publish them as one snapshot.
+    Scan types without a report keep their current findings.
+
+    Args:
+        scan_result (ScanResult): The ScanResult object to retrieve results.
+        db_cols (list): List of database columns.
+        db_path (str): Path to the database file.
+
+    Returns:
+        int: The published snapshot generation.
+    """
+    loop = asyncio.get_running_loop()
+    builder = SnapshotBuilder(db_path)
+    await loop.run_in_executor(None, builder.begin)
+    try:
+        imported = {}
+        kept = []
+        for scan_type, record_type, process_func in SCAN_TYPES:
+            kwargs = {"type": record_type} if process_func else {}
+            try:
+                rows = await build_scan_records(scan_type, scan_result, db_cols, process_func, **kwargs)
+            except Exception as e:
+                print(f"Error processing {scan_type} scan, keeping its current findings: {e}")
+                rows = None
+            if rows is None:
+                kept.append(record_type)
+                continue
+            await loop.run_in_executor(None, builder.add, rows)
+            imported[record_type] = rows
+        await loop.run_in_executor(None, builder.carry_over, kept)
+        generation = await loop.run_in_executor(None, builder.publish)
+    finally:
+        builder.close()
+
+    for record_type, rows in imported.items():
+        await record_scan_run(rows, [record_type])
+    return generation
+
+async def initialize_database_and_scans(mode: str = SCAN_IMPORT_MODE, profile: bool = None):
+    """
+    Initialize the database and import the scan results.
+
+    Args:
+        mode (str): "atomic" or "upsert", see SCAN_IMPORT_MODE.
+        profile (bool, optional): Profile the import; defaults to PROFILE_ENABLED.
+    """
+    with profile_run("scan_import", enabled=profile):
+        # Use the consistent absolute path
+        await init_db(DEFAULT_DB_PATH)
+
+        scan_result = ScanResult()
+
+        if mode == "atomic":
+            return await import_snapshot(scan_result, DB_COLS)
 
-    # Process different scan types
-    await process_and_upsert_scan_results("kubernetes", scan_result, db_cols)
-    await process_and_upsert_scan_results("aws", scan_result, db_cols)
-    await process_and_upsert_scan_results("code", scan_result, db_cols, process_func=process_code_scan, type="CODE")
-    await process_and_upsert_scan_results("container", scan_result, db_cols, process_func=process_code_scan, type="CONTAINER")
+        # Process different scan types
+        for scan_type, record_type, process_func in SCAN_TYPES:
+            if process_func:
+                await process_and_upsert_scan_results(scan_type, scan_result, DB_COLS, process_func=process_func, type=record_type)
+            else:
+                await process_and_upsert_scan_results(scan_type, scan_result, DB_COLS)
+        await delete_unused_rules()
 
 if __name__ == '__main__':
-    asyncio.run(initialize_database_and_scans())
+    parser = argparse.ArgumentParser(description="Import scan results into the database")
+    parser.add_argument("--mode", choices=["atomic", "upsert"], default=SCAN_IMPORT_MODE,
+                        help="atomic: publish all results at once; upsert: write each scan type into the live tables")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="Write cProfile/tracemalloc output of the import to PROFILE_DIR")
+    args = parser.parse_args()
+    asyncio.run(initialize_database_and_scans(args.mode, args.profile))
@@ -1,15 +1,24 @@
+import asyncio
+import gzip
+import inspect
 import os
 import json
-from typing import Optional
-from src.scan.kubernetes import scan_kubernetes, k8s_resource_misconfigure
+import zlib
+from typing import Optional, Union
+from src.scan.kubernetes import scan_kubernetes, scan_kubernetes_sharded, k8s_resource_misconfigure
 from src.scan.filesystem import scan_filesystem
 from src.scan.image import scan_image
 from src.scan.aws import scan_aws
+from src.scan.util import compact_json
 import yaml
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from src.db.config import DEFAULT_DB_PATH
 
+REPORT_COMPRESS_LEVEL = int(os.getenv("REPORT_COMPRESS_LEVEL", "6"))
+# Superseded records tolerated in a result store before it is compacted on read
+REPORT_COMPACT_SLACK = int(os.getenv("REPORT_COMPACT_SLACK", "8"))
+
 # Create an async engine; using the "aiosqlite" dialect for SQLite.
 DATABASE_URL = f"sqlite+aiosqlite:///{DEFAULT_DB_PATH}"
 engine = create_async_engine(DATABASE_URL, echo=True)
@@ -52,29 +61,104 @@ class ScanResult:
         os.makedirs(resource_dir, exist_ok=True)
         return os.path.join(resource_dir, f"{resource_name}.json")
 
+    def _get_store_path(self, resource_type: str, resource_name: str) -> str:
+        """
+        Construct the path of the compressed, append-only result store for a resource.
+
+        :param resource_type: The type of resource (e.g., 'code', 'container', 'kubernetes', 'aws').
+        :param resource_name: The name of the resource.
+        :return: The file path as a string.
+        """
+        resource_dir = os.path.join(self.base_dir, resource_type)
+        os.makedirs(resource_dir, exist_ok=True)
+        return os.path.join(resource_dir, f"{resource_name}.jsonl.gz")
+
+    def _append_records(self, store_path: str, records: list) -> None:
+        # Each append is a separate gzip member; gzip readers concatenate members transparently
+        payload = "".join(compact_json(record) + "\n" for record in records)
+        with gzip.open(store_path, "at", encoding="utf-8", compresslevel=REPORT_COMPRESS_LEVEL) as f:
+            f.write(payload)
+
+    def _read_store(self, store_path: str) -> tuple:
+        """
+        Replay the records of a result store.
+
+        :param store_path: Path of the .jsonl.gz store.
+        :return: A tuple (components, record_count) where components maps a component name to its latest result.
+        """
+        components = {}
+        count = 0
+        try:
+            with gzip.open(store_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.decoder.JSONDecodeError:
+                        # A torn final append; keep what was complete
+                        break
+                    components[record["component"]] = record["result"]
+                    count += 1
+        except (EOFError, zlib.error) as e:
+            print(f"Truncated scan result store {store_path}: {e}")
+        return components, count
+
+    def _ingest_legacy(self, resource_type: str, resource_name: str) -> None:
+        """
+        Copy plain (.json) or gzip (.json.gz) reports, such as Trivy output, into the result
+        store when they are newer than it. The reports are left in place; the store's
+        modification time marks them as ingested.
+        """
+        store_path = self._get_store_path(resource_type, resource_name)
+        store_mtime = os.path.getmtime(store_path) if os.path.exists(store_path) else None
+        plain_path = self._get_file_path(resource_type, resource_name)
+        for legacy_path, opener in ((plain_path + ".gz", gzip.open), (plain_path, open)):
+            if not os.path.exists(legacy_path):
+                continue
+            if store_mtime is not None and os.path.getmtime(legacy_path) <= store_mtime:
+                continue
+            with opener(legacy_path, "rt") as f:
+                try:
+                    data = json.load(f)
+                except json.decoder.JSONDecodeError:
+                    raise ReportFormatException()
+            # Files written by earlier versions of set_scan_result hold all components
+            if isinstance(data, dict) and "_default" in data:
+                records = [{"component": name, "result": result} for name, result in data.items()]
+            else:
+                records = [{"component": "_default", "result": data}]
+            self._append_records(store_path, records)
+            store_mtime = os.path.getmtime(store_path)
+
+    def compact(self, resource_type: str, resource_name: str = "default") -> None:
+        """
+        Rewrite a result store keeping only the latest record of each component.
+
+        :param resource_type: The type of resource (e.g., 'code', 'container', 'kubernetes', 'aws').
+        :param resource_name: The name of the resource.
+        """
+        store_path = self._get_store_path(resource_type, resource_name)
+        if not os.path.exists(store_path):
+            return
+        components, _ = self._read_store(store_path)
+        tmp_path = f"{store_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        self._append_records(tmp_path, [{"component": name, "result": result} for name, result in components.items()])
+        os.replace(tmp_path, store_path)
+
     def set_scan_result(self, resource_type: str, resource_name: str, result: str, component_name: Optional[str] = None) -> None:
         """
         Set the scan result for a given resource type and name.
+        The result is appended to the resource's compressed store; other components are not rewritten.
 
         :param resource_type: The type of resource (e.g., 'code', 'container', 'kubernetes', 'aws').
         :param resource_name: The name of the resource.
         :param result: The scan result to store.
         :param component_name: Optional name of a component within the resource.
         """
-        file_path = self._get_file_path(resource_type, resource_name)
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-        else:
-            data = {}
-
-        if component_name:
-            data[component_name] = result
-        else:
-            data["_default"] = result
-
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        self._ingest_legacy(resource_type, resource_name)
+        record = {"component": component_name or "_default", "result": result}
+        self._append_records(self._get_store_path(resource_type, resource_name), [record])
 
     def get_scan_result(self, resource_type: str, resource_name: str = "default", component_name: Optional[str] = None) -> Optional[str]:
         """
@@ -85,47 +169,85 @@ class ScanResult:
         :param component_name: Optional name of a component within the resource.
         :return: The scan result or None if not found.
         """
-        file_path = self._get_file_path(resource_type, resource_name)
-        if not os.path.exists(file_path):
+        self._ingest_legacy(resource_type, resource_name)
+        store_path = self._get_store_path(resource_type, resource_name)
+        if not os.path.exists(store_path):
             return None
 
-        with open(file_path, 'r') as f:
-            try:
-                data = json.load(f)
-            except json.decoder.JSONDecodeError:
-                raise ReportFormatException()
-            if component_name and resource_type == "kubernetes":
-                return k8s_resource_misconfigure(data, component_name)
-            return data
-        return None
-
-    def scan(self, resource_type: str, config_path: Optional[str] = "/tmp/tmcybertron/agent.yaml", bg: bool = False):
+        components, count = self._read_store(store_path)
+        if count > 2 * len(components) + REPORT_COMPACT_SLACK:
+            self.compact(resource_type, resource_name)
+        if component_name:
+            if component_name in components:
+                return components[component_name]
+            if resource_type == "kubernetes" and "_default" in components:
+                return k8s_resource_misconfigure(components["_default"], component_name)
+            return None
+        return components.get("_default")
+
+    def scan(self, resource_type: str, config_path: Optional[str] = "/tmp/tmcybertron/agent.yaml", bg: bool = False,
+             run_async: bool = False, on_progress=None):
         scan_config = get_scan_config(config_path)
         if resource_type == "code" and scan_config["code"]:
             print (f'========================== Start Scan Code Path ({scan_config["code"]["folder"]})  ==========================')
-            scan_filesystem(
+            return scan_filesystem(
                 path=scan_config["code"]["folder"],
                 report=self._get_file_path(resource_type, "default"),
-                bg=bg
+                bg=bg,
+                run_async=run_async,
+                on_progress=on_progress,
             )
         elif resource_type == "container" and scan_config["container"]:
             print (f'========================== Start Scan Image({scan_config["container"]["image_path"]}) ==========================')
-            scan_image(
+            return scan_image(
                 image_path=scan_config["container"]["image_path"],
                 report=self._get_file_path(resource_type, "default"),
-                bg=bg
+                bg=bg,
+                run_async=run_async,
+                on_progress=on_progress,
             )
         elif resource_type == "kubernetes" and scan_config["kubernetes"]:
             print (f'========================== Start Scan Kubernetes ({scan_config["kubernetes"]["config_path"]}) ==========================')
-            scan_kubernetes(
+            if scan_config["kubernetes"].get("sharded"):
+                # One trivy run per namespace, see scan_kubernetes_sharded
+                sharded_scan = scan_kubernetes_sharded(
+                    self,
+                    config_path=scan_config["kubernetes"]["config_path"],
+                    namespaces=scan_config["kubernetes"].get("namespaces"),
+                    on_progress=on_progress,
+                )
+                return sharded_scan if run_async else asyncio.run(sharded_scan)
+            return scan_kubernetes(
                 report=self._get_file_path(resource_type, "default"),
                 config_path=scan_config["kubernetes"]["config_path"],
-                bg=bg
+                bg=bg,
+                run_async=run_async,
+                on_progress=on_progress,
             )
         elif resource_type == "aws" and scan_config["aws"]:
             print (f'========================== Start Scan AWS ({scan_config["aws"]["region"]}) ==========================')
-            scan_aws(
+            return scan_aws(
                 report=self._get_file_path(resource_type, "default"),
                 region=scan_config["aws"]["region"],
-                bg=bg
+                bg=bg,
+                run_async=run_async,
+                on_progress=on_progress,
             )
+
+    async def ascan(self, resource_type: str, config_path: Optional[str] = "/tmp/tmcybertron/agent.yaml",
+                    on_progress=None) -> Optional[Union[str, dict]]:
+        """
+        Run the scan of a resource type without blocking the event loop, e.g. from the web app.
+
+        Cancelling the call terminates the scanner process.
+
+        :param resource_type: The type of resource (e.g., 'code', 'container', 'kubernetes', 'aws').
+        :param config_path: Path of the scan config.
+        :param on_progress: Called with each ScanProgress update of the scanner.
+        :return: The path of the report (the summary of a sharded kubernetes scan), or None when
+                 the scan was not started (not configured, missing path, or an existing kubernetes report).
+        """
+        result = self.scan(resource_type, config_path, run_async=True, on_progress=on_progress)
+        if not inspect.isawaitable(result):
+            return None
+        return await result
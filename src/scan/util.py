@@ -1,8 +1,14 @@
+import asyncio
 import subprocess
 import os
+import re
 import sys
 import io
 import json
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Optional
 import tiktoken
 import json
 import pandas as pd
@@ -96,3 +102,170 @@ def run_command_bg(command: list):
         stderr=sys.stderr
     )
     return process
+
+# Scanner processes running at the same time; Trivy is CPU and memory heavy
+SCAN_MAX_CONCURRENCY = int(os.getenv("SCAN_MAX_CONCURRENCY", "2"))
+# Seconds before a scanner process is terminated
+SCAN_TIMEOUT = float(os.getenv("SCAN_TIMEOUT", "7200"))
+# Seconds a terminated scanner gets to exit before it is killed
+SCAN_TERMINATE_GRACE = 10
+
+# Trivy progress bar, e.g. "156 / 263 [------->______] 59.32% 12 p/s"
+TRIVY_PROGRESS = re.compile(r"(\d+)\s*/\s*(\d+)\s*\[[^\]]*\]\s*([\d.]+)\s*%")
+
+@dataclass
+class ScanProgress:
+    completed: int
+    total: int
+    percent: float
+
+def parse_trivy_progress(line: str) -> Optional[ScanProgress]:
+    """
+    Parse a Trivy progress bar update.
+
+    :param line: A line (or carriage-return separated update) of Trivy's output.
+    :return: The progress, or None for other output.
+    """
+    match = TRIVY_PROGRESS.search(line)
+    if match is None:
+        return None
+    return ScanProgress(int(match.group(1)), int(match.group(2)), float(match.group(3)))
+
+def print_progress(step: float = 5.0) -> Callable[[ScanProgress], None]:
+    """Return a progress callback that prints every `step` percent."""
+    last = [-step]
+
+    def on_progress(progress: ScanProgress):
+        if progress.percent - last[0] >= step or progress.completed == progress.total:
+            last[0] = progress.percent
+            print(f"Scan progress: {progress.completed}/{progress.total} ({progress.percent:.0f}%)")
+    return on_progress
+
+# One shared limit per event loop; an asyncio.Semaphore is bound to the loop that first waits on it
+_scan_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def get_scan_semaphore() -> asyncio.Semaphore:
+    """
+    Return the semaphore limiting concurrent scanner processes to SCAN_MAX_CONCURRENCY
+    on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _scan_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _scan_semaphores[loop] = asyncio.Semaphore(SCAN_MAX_CONCURRENCY)
+    return semaphore
+
+async def _stop_process(process: asyncio.subprocess.Process):
+    if process.returncode is not None:
+        return
+    process.terminate()
+    try:
+        await asyncio.wait_for(process.wait(), SCAN_TERMINATE_GRACE)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+async def run_command_async(
+    command: list,
+    output_file: str,
+    timeout: Optional[float] = SCAN_TIMEOUT,
+    on_progress: Optional[Callable[[ScanProgress], None]] = None,
+    on_output: Optional[Callable[[str], None]] = print,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> str:
+    """
+    Run a scanner command without blocking the event loop.
+
+    stdout and stderr are read as they are written; progress bar updates go to
+    on_progress and other lines to on_output. At most SCAN_MAX_CONCURRENCY commands
+    run at once. On timeout or cancellation the process is terminated (then killed).
+
+    :param command: The command and its arguments.
+    :param output_file: The report file the command writes.
+    :param timeout: Seconds before the command is stopped, None for no limit.
+    :param on_progress: Called with each parsed progress update, defaults to printing every 5%.
+    :param on_output: Called with every other output line, None to discard them.
+    :param semaphore: Concurrency limit, defaults to the shared scan semaphore.
+    :return: The path of the report, to be parsed by the caller (e.g. streamed).
+    :raises subprocess.CalledProcessError: The command failed; output holds its last lines.
+    :raises subprocess.TimeoutExpired: The command ran longer than timeout.
+    :raises NoOutputError: The command succeeded without writing output_file.
+    """
+    if on_progress is None:
+        on_progress = print_progress()
+    tail = deque(maxlen=50)
+
+    def handle(raw: bytes):
+        line = raw.decode("utf-8", errors="replace").strip()
+        if not line:
+            return
+        progress = parse_trivy_progress(line)
+        if progress is not None:
+            on_progress(progress)
+            return
+        tail.append(line)
+        if on_output is not None:
+            on_output(line)
+
+    async def pump(stream: asyncio.StreamReader):
+        # Progress bars redraw with carriage returns, so split on both
+        buffer = b""
+        while chunk := await stream.read(65536):
+            *lines, buffer = re.split(rb"[\r\n]", buffer + chunk)
+            for raw in lines:
+                handle(raw)
+        handle(buffer)
+
+    async with semaphore or get_scan_semaphore():
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        readers = [asyncio.ensure_future(pump(process.stdout)), asyncio.ensure_future(pump(process.stderr)),
+                   asyncio.ensure_future(process.wait())]
+        try:
+            _, pending = await asyncio.wait(readers, timeout=timeout)
+        finally:
+            # On timeout or cancellation (e.g. the web request went away) the process is
+            # stopped, which closes its pipes and ends the readers
+            await asyncio.shield(_stop_process(process))
+            await asyncio.gather(*readers, return_exceptions=True)
+        if pending:
+            raise subprocess.TimeoutExpired(command, timeout, output="\n".join(tail))
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, output="\n".join(tail))
+    if not os.path.exists(output_file):
+        raise NoOutputError(output_file)
+    return output_file
+
+# Low-cardinality finding columns stored as pandas categoricals
+FINDING_CATEGORICAL_COLUMNS = ("type", "severity", "service_name")
+
+def intern_text(value) -> str:
+    """
+    Intern a report string so repeated values (titles, descriptions, resolutions)
+    share one object instead of one copy per finding.
+
+    :param value: String or None read from a scan report.
+    :return: The interned string, "" for None.
+    """
+    if value is None:
+        return ""
+    return sys.intern(value) if isinstance(value, str) else value
+
+def build_findings_frame(columns: dict) -> pd.DataFrame:
+    """
+    Build a findings DataFrame from per-column lists.
+
+    :param columns: Mapping of column name to a list of values, all of the same length.
+    :return: A DataFrame with FINDING_CATEGORICAL_COLUMNS stored as categoricals.
+    """
+    df = pd.DataFrame(columns, copy=False)
+    for column in FINDING_CATEGORICAL_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype("category")
+    return df
+
+# Compact JSON for cause metadata stored alongside each finding
+compact_json = json.JSONEncoder(separators=(",", ":")).encode
+EMPTY_CAUSE_METADATA = compact_json({})
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+REPORT_CACHE_TTL = float(os.environ.get("REPORT_CACHE_TTL", "600"))
+
+
+class TTLObjectCache:
+    """
+    Thread-safe in-memory cache for handing Python objects between graph nodes and the UI
+    without serializing them into the graph state. Entries expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = REPORT_CACHE_TTL, max_items: int = 256):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self, now: float) -> None:
+        expired = [k for k, (expires, _) in self._items.items() if expires <= now]
+        for key in expired:
+            del self._items[key]
+        # Dicts keep insertion order, so the oldest entries go first
+        while len(self._items) > self.max_items:
+            del self._items[next(iter(self._items))]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (now + self.ttl, value)
+            self._evict(now)
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            item = self._items.get(key)
+            return item[1] if item else default
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            item = self._items.pop(key, None)
+            return item[1] if item else default
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict(time.monotonic())
+            return len(self._items)
+
+
+BLOB_CACHE_BYTES = int(os.environ.get("BLOB_CACHE_BYTES", str(16 * 1024 * 1024)))
+BLOB_CACHE_MAX_ITEM = int(os.environ.get("BLOB_CACHE_MAX_ITEM", str(256 * 1024)))
+
+
+class LRUBytesCache:
+    """
+    Thread-safe LRU cache for small byte strings, bounded by the total size of its values.
+    Values larger than ``max_item`` bytes are not cached.
+    """
+
+    def __init__(self, max_bytes: int = BLOB_CACHE_BYTES, max_item: int = BLOB_CACHE_MAX_ITEM):
+        self.max_bytes = max_bytes
+        self.max_item = min(max_item, max_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: dict[Hashable, bytes] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            value = self._items.pop(key, None)
+            if value is None:
+                self.misses += 1
+                return None
+            # Re-insert to mark as most recently used
+            self._items[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes) -> None:
+        if len(value) > self.max_item:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                evicted = self._items.pop(next(iter(self._items)))
+                self.size -= len(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._items), "bytes": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,122 @@
+import importlib.util
+import os
+import threading
+from typing import Optional
+
+import httpx
+
+from src.utils.metrics import REGISTRY, Gauge
+
+# Pool of the HTTP client shared by all chat models
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))  # seconds an idle connection is kept
+# auto: HTTP/2 when the h2 package is installed; true / false to force it
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "auto").lower()
+
+
+class ConnectionStats:
+    """
+    Requests, new connections and TLS handshakes of an httpx client, from httpcore trace events.
+
+    Requests minus new connections is the number of requests served on a reused
+    (keep-alive or multiplexed) connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+        self.connect_errors = 0
+
+    def _inc(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self._inc("requests")
+        request.extensions["trace"] = self.trace
+
+    async def trace(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self._inc("connections")
+        elif event_name == "connection.start_tls.complete":
+            self._inc("tls_handshakes")
+        elif event_name in ("connection.connect_tcp.failed", "connection.start_tls.failed"):
+            self._inc("connect_errors")
+
+    def reuse_ratio(self) -> float:
+        with self._lock:
+            if not self.requests:
+                return 0.0
+            return max(0, self.requests - self.connections) / self.requests
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections": self.connections,
+                "tls_handshakes": self.tls_handshakes,
+                "connect_errors": self.connect_errors,
+            }
+
+
+def http2_enabled(setting: str = LLM_HTTP2) -> bool:
+    if setting == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return setting == "true"
+
+
+def create_http_client(stats: ConnectionStats, http2: Optional[bool] = None) -> httpx.AsyncClient:
+    """
+    Create a pooled keep-alive async HTTP client whose connections are counted in stats.
+
+    Args:
+        stats (ConnectionStats): Receives the request and connection events.
+        http2 (bool, optional): Use HTTP/2, defaults to LLM_HTTP2.
+
+    Returns:
+        httpx.AsyncClient: Timeouts are left to the caller, the OpenAI client sets them per request.
+    """
+    limits = httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=http2_enabled() if http2 is None else http2,
+        follow_redirects=True,
+        event_hooks={"request": [stats.on_request]},
+    )
+
+
+LLM_HTTP_STATS = ConnectionStats()
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_llm_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide HTTP client shared by all chat models.
+
+    Its connections are bound to the event loop that opens them, so the models must
+    be used from a single event loop, as in the app and scan_import.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = create_http_client(LLM_HTTP_STATS)
+        http_version = "HTTP/2" if http2_enabled() else "HTTP/1.1"
+        print(f"LLM HTTP client: {http_version}, max {LLM_HTTP_MAX_CONNECTIONS} connections, "
+              f"{LLM_HTTP_MAX_KEEPALIVE} kept alive for {LLM_HTTP_KEEPALIVE_EXPIRY:g}s")
+    return _http_client
+
+
+REGISTRY.register(Gauge("llm_http_requests", "HTTP requests sent by the shared chat model client.",
+                        lambda: LLM_HTTP_STATS.stats()["requests"]))
+REGISTRY.register(Gauge("llm_http_connections_opened", "Connections opened by the shared chat model client.",
+                        lambda: LLM_HTTP_STATS.stats()["connections"]))
+REGISTRY.register(Gauge("llm_http_tls_handshakes", "TLS handshakes of the shared chat model client.",
+                        lambda: LLM_HTTP_STATS.stats()["tls_handshakes"]))
+REGISTRY.register(Gauge("llm_http_connection_reuse_ratio", "Share of requests sent on a reused connection.",
+                        LLM_HTTP_STATS.reuse_ratio))
@@ -0,0 +1,277 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Union
+
+from langchain_core.runnables.config import ensure_config, merge_configs
+
+from src.utils.metrics import (
+    REGISTRY, FirstTokenTimer, Gauge, LLM_ERRORS, LLM_QUEUE_SECONDS, LLM_REQUEST_SECONDS, LLM_TTFT_SECONDS,
+    record_llm_response,
+)
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_CONCURRENCY_PER_CLIENT = int(os.environ.get("LLM_MAX_CONCURRENCY_PER_CLIENT", "2"))
+LLM_RATE_LIMIT = float(os.environ.get("LLM_RATE_LIMIT", "5"))  # requests per second, 0 disables
+LLM_RATE_BURST = int(os.environ.get("LLM_RATE_BURST", "10"))
+
+# Model methods that would send requests around the gateway; sync calls cannot wait on
+# its asyncio queue, and the others return runnables that are no longer wrapped
+_UNGATED_METHODS = (
+    "invoke", "stream", "batch", "batch_as_completed", "abatch_as_completed", "astream_events", "astream_log",
+    "with_structured_output", "with_retry", "with_fallbacks", "pipe",
+)
+
+# Identifies the caller (chat thread) for the per-client cap; None means no per-client cap
+llm_client_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_client_id", default=None)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter refilled at ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the time waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class _WaitStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_seconds": self.total / self.count if self.count else 0.0,
+            "max_seconds": self.max,
+        }
+
+
+class LLMGateway:
+    """
+    Process-wide admission control for LLM requests.
+
+    Requests wait in a priority queue until a global slot and a per-client slot are free,
+    then take a token from the rate limiter before being sent to the provider.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        per_client_concurrency: int = LLM_MAX_CONCURRENCY_PER_CLIENT,
+        rate: float = LLM_RATE_LIMIT,
+        burst: int = LLM_RATE_BURST,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_client_concurrency = max(1, per_client_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self._active = 0
+        self._active_by_client: dict[str, int] = {}
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._max_queue_depth = 0
+        self._wait_stats: dict[int, _WaitStats] = {}
+
+    def _can_start(self, client: Optional[str]) -> bool:
+        if self._active >= self.max_concurrency:
+            return False
+        return client is None or self._active_by_client.get(client, 0) < self.per_client_concurrency
+
+    def _start(self, client: Optional[str]) -> None:
+        self._active += 1
+        if client is not None:
+            self._active_by_client[client] = self._active_by_client.get(client, 0) + 1
+
+    def _release(self, client: Optional[str]) -> None:
+        self._active -= 1
+        if client is not None:
+            remaining = self._active_by_client.get(client, 1) - 1
+            if remaining:
+                self._active_by_client[client] = remaining
+            else:
+                self._active_by_client.pop(client, None)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant free slots to the highest-priority waiters whose client is under its cap."""
+        for entry in sorted(self._waiters):
+            if self._active >= self.max_concurrency:
+                break
+            _, _, client, future = entry
+            if future.done() or not self._can_start(client):
+                continue
+            self._waiters.remove(entry)
+            self._start(client)
+            future.set_result(None)
+        heapq.heapify(self._waiters)
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, client: Optional[str] = None) -> None:
+        enqueued = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), client, future)
+        heapq.heappush(self._waiters, entry)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiters))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before cancellation
+                self._release(client)
+            elif entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        try:
+            await self.bucket.acquire()
+        except BaseException:
+            self._release(client)
+            raise
+        self._wait_stats.setdefault(priority, _WaitStats()).observe(time.monotonic() - enqueued)
+
+    def release(self, client: Optional[str] = None) -> None:
+        self._release(client)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, client: Optional[str] = None):
+        await self.acquire(priority, client)
+        try:
+            yield
+        finally:
+            self.release(client)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self._max_queue_depth,
+            "wait": {priority: stats.to_dict() for priority, stats in self._wait_stats.items()},
+        }
+
+
+class GatedChatModel:
+    """
+    Wrap a chat model so that every ainvoke(), astream() and abatch() goes through the LLM gateway.
+    Queue wait, request time, time to first token and token usage of each call are
+    recorded under the model's role. Methods that would bypass the gateway raise
+    TypeError; everything else is delegated to the wrapped model.
+    """
+
+    def __init__(self, model, gateway: LLMGateway, priority: int = PRIORITY_INTERACTIVE, role: str = "default"):
+        self.model = model
+        self.gateway = gateway
+        self.priority = priority
+        self.role = role
+
+    async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs) -> Any:
+        enqueued = time.perf_counter()
+        async with self.gateway.slot(self.priority, llm_client_id.get()):
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - enqueued, role=self.role)
+            # Added to the inherited callbacks (graph streaming, tracing), not replacing them
+            timer = FirstTokenTimer()
+            config = merge_configs(ensure_config(config), {"callbacks": [timer]})
+            try:
+                with LLM_REQUEST_SECONDS.time(role=self.role):
+                    response = await self.model.ainvoke(input, config, **kwargs)
+            except Exception:
+                LLM_ERRORS.inc(role=self.role)
+                raise
+        if timer.first_token is not None:
+            LLM_TTFT_SECONDS.observe(timer.first_token, role=self.role)
+        record_llm_response(self.role, response)
+        return response
+
+    async def astream(self, input: Any, config: Optional[dict] = None, **kwargs) -> AsyncIterator[Any]:
+        """Stream the response, holding the gateway slot until the last chunk or until the caller stops."""
+        enqueued = time.perf_counter()
+        response = None
+        async with self.gateway.slot(self.priority, llm_client_id.get()):
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - enqueued, role=self.role)
+            timer = FirstTokenTimer()
+            config = merge_configs(ensure_config(config), {"callbacks": [timer]})
+            try:
+                with LLM_REQUEST_SECONDS.time(role=self.role):
+                    async for chunk in self.model.astream(input, config, **kwargs):
+                        response = chunk if response is None else response + chunk
+                        yield chunk
+            except Exception:
+                LLM_ERRORS.inc(role=self.role)
+                raise
+        if timer.first_token is not None:
+            LLM_TTFT_SECONDS.observe(timer.first_token, role=self.role)
+        record_llm_response(self.role, response)
+
+    async def abatch(self, inputs: list, config: Optional[Union[dict, list[dict]]] = None, *,
+                     return_exceptions: bool = False, **kwargs) -> list:
+        """Send each input as its own gated ainvoke(), so a batch queues like separate requests."""
+        configs = config if isinstance(config, list) else [config] * len(inputs)
+        return await asyncio.gather(*(self.ainvoke(item, item_config, **kwargs)
+                                      for item, item_config in zip(inputs, configs)),
+                                    return_exceptions=return_exceptions)
+
+    def with_config(self, *args, **kwargs) -> "GatedChatModel":
+        return GatedChatModel(self.model.with_config(*args, **kwargs), self.gateway, self.priority, self.role)
+
+    def bind(self, **kwargs) -> "GatedChatModel":
+        return GatedChatModel(self.model.bind(**kwargs), self.gateway, self.priority, self.role)
+
+    def bind_tools(self, *args, **kwargs) -> "GatedChatModel":
+        return GatedChatModel(self.model.bind_tools(*args, **kwargs), self.gateway, self.priority, self.role)
+
+    def __getattr__(self, name: str) -> Any:
+        if name in _UNGATED_METHODS:
+            raise TypeError(f"{name}() would bypass the LLM gateway; use ainvoke(), astream() or abatch()")
+        return getattr(self.model, name)
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Return the process-wide gateway shared by all chat models."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
+
+
+REGISTRY.register(Gauge("llm_gateway_active_requests", "Chat model calls holding a gateway slot.",
+                        lambda: get_llm_gateway().stats()["active"]))
+REGISTRY.register(Gauge("llm_gateway_queue_depth", "Chat model calls waiting for a gateway slot.",
+                        lambda: get_llm_gateway().stats()["queue_depth"]))
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.load import dumps, loads
+
+# off: call the provider; record: call the provider and store every response;
+# replay: serve stored responses only, failing on requests that were not recorded
+LLM_REPLAY_MODE = os.environ.get("LLM_REPLAY_MODE", "off").lower()
+LLM_REPLAY_PATH = os.environ.get("LLM_REPLAY_PATH", "./llm_replay.db")
+# original: wait as long as the recorded call took; zero: answer immediately
+LLM_REPLAY_LATENCY = os.environ.get("LLM_REPLAY_LATENCY", "original").lower()
+
+REPLAY_MODES = ("off", "record", "replay")
+
+# Message fields that differ between otherwise identical requests (generated ids,
+# provider metadata of earlier responses) and are not sent to the provider
+_VOLATILE_MESSAGE_FIELDS = ("id", "response_metadata", "usage_metadata")
+# Model settings that select the endpoint or transport rather than the response
+_TRANSPORT_MODEL_FIELDS = (
+    "openai_api_base", "openai_api_key", "openai_organization", "openai_proxy", "base_url", "api_key",
+    "request_timeout", "timeout", "max_retries", "default_headers", "default_query", "stream_usage",
+)
+
+REPLAY_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_replay (
+    request_key TEXT PRIMARY KEY,
+    llm_string TEXT NOT NULL,
+    response TEXT NOT NULL,
+    latency REAL NOT NULL,
+    recorded_at TEXT NOT NULL
+)
+"""
+
+
+# Request key and start time of the call being recorded. Each call looks up and updates
+# the cache in its own context (task or executor thread), so concurrent calls, even
+# identical ones, do not share it, and a failed call leaves nothing behind
+_recording: contextvars.ContextVar[Optional[tuple]] = contextvars.ContextVar("llm_replay_recording", default=None)
+
+
+class ReplayMissError(LookupError):
+    """Raised in replay mode for a request that was not recorded."""
+
+
+def request_key(prompt: str, llm_string: str) -> str:
+    """
+    Return the key of a chat model request.
+
+    Args:
+        prompt (str): The serialized messages, as passed to BaseCache.lookup.
+        llm_string (str): The serialized model name and parameters.
+
+    Returns:
+        str: Hex SHA-256 of the model parameters and the normalized messages, so that
+        recordings replay against another endpoint or after a restart.
+    """
+    model, separator, parameters = llm_string.partition("---")
+    try:
+        model_config = json.loads(model)
+        kwargs = model_config.get("kwargs", {})
+        for field in _TRANSPORT_MODEL_FIELDS:
+            kwargs.pop(field, None)
+        llm_string = json.dumps(model_config, sort_keys=True) + separator + parameters
+    except (ValueError, TypeError, AttributeError):
+        pass
+    try:
+        messages = json.loads(prompt)
+        for message in messages if isinstance(messages, list) else []:
+            kwargs = message.get("kwargs") if isinstance(message, dict) else None
+            if isinstance(kwargs, dict):
+                for field in _VOLATILE_MESSAGE_FIELDS:
+                    kwargs.pop(field, None)
+        prompt = json.dumps(messages, sort_keys=True)
+    except (ValueError, TypeError):
+        pass
+    return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class ReplayCache(BaseCache):
+    """
+    LangChain cache that records chat model responses to SQLite and replays them.
+
+    In record mode every lookup misses, so each request reaches the provider, and the
+    response is stored with the time the call took. In replay mode responses are
+    served from the store only, optionally after the recorded latency.
+    """
+
+    def __init__(self, mode: str = LLM_REPLAY_MODE, path: str = LLM_REPLAY_PATH, latency: str = LLM_REPLAY_LATENCY):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown replay mode '{mode}'. Allowed modes are record, replay.")
+        self.mode = mode
+        self.path = path
+        self.replay_latency = latency == "original"
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Used from the event loop and from executor threads, guarded by the lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(REPLAY_TABLE_SCHEMA)
+        self.conn.commit()
+
+    def _load(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            return self.conn.execute(
+                "SELECT response, latency FROM llm_replay WHERE request_key = ?", (key,)
+            ).fetchone()
+
+    def _start_recording(self, key: str) -> None:
+        # Timed from the lookup, which precedes the provider call
+        _recording.set((key, time.perf_counter()))
+
+    def _recorded(self, key: str) -> tuple:
+        row = self._load(key)
+        if row is None:
+            raise ReplayMissError(f"No recorded response for request {key[:12]} in {self.path}")
+        return loads(row[0]), row[1] if self.replay_latency else 0.0
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = request_key(prompt, llm_string)
+        if self.mode == "record":
+            self._start_recording(key)
+            return None
+        response, latency = self._recorded(key)
+        if latency > 0:
+            time.sleep(latency)
+        return response
+
+    async def alookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = request_key(prompt, llm_string)
+        if self.mode == "record":
+            self._start_recording(key)
+            return None
+        response, latency = self._recorded(key)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return response
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        if self.mode != "record":
+            return
+        key = request_key(prompt, llm_string)
+        recording = _recording.get()
+        latency = time.perf_counter() - recording[1] if recording is not None and recording[0] == key else 0.0
+        _recording.set(None)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO llm_replay (request_key, llm_string, response, latency, recorded_at) "
+                "VALUES (?, ?, ?, ?, datetime('now'))",
+                (key, llm_string, dumps(return_val), latency),
+            )
+            self.conn.commit()
+
+    async def aupdate(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        self.update(prompt, llm_string, return_val)
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM llm_replay")
+            self.conn.commit()
+
+
+_replay_cache: Optional[ReplayCache] = None
+
+
+def get_replay_cache() -> Optional[ReplayCache]:
+    """Return the process-wide record/replay cache, or None when LLM_REPLAY_MODE is off."""
+    global _replay_cache
+    if LLM_REPLAY_MODE not in REPLAY_MODES:
+        raise ValueError(f"Unknown LLM_REPLAY_MODE '{LLM_REPLAY_MODE}'. Allowed modes are {', '.join(REPLAY_MODES)}.")
+    if LLM_REPLAY_MODE == "off":
+        return None
+    if _replay_cache is None:
+        _replay_cache = ReplayCache()
+        print(f"LLM {LLM_REPLAY_MODE} mode, store {LLM_REPLAY_PATH}")
+    return _replay_cache
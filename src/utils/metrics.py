@@ -0,0 +1,236 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+# Latency buckets in seconds, from fast DB lookups to long report generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 131072)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter, one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """Gauge read from a callback when the metrics are rendered."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, function: Callable[[], float]):
+        super().__init__(name, help)
+        self.function = function
+
+    def _samples(self) -> list[str]:
+        return [f"{self.name} {_format_value(self.function())}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per series: bucket counts (last one is +Inf), sum
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        lines = []
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                labels = _format_labels(key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+NODE_SECONDS = REGISTRY.register(Histogram(
+    "graph_node_duration_seconds", "Wall time of LangGraph node executions.", ["node", "status"]))
+LLM_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "llm_request_duration_seconds", "Wall time of chat model calls, excluding the gateway queue.", ["role"]))
+LLM_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "llm_queue_wait_seconds", "Time chat model calls waited for an LLM gateway slot.", ["role"]))
+LLM_TTFT_SECONDS = REGISTRY.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time from sending a streamed chat model call to its first token.", ["role"]))
+LLM_PROMPT_TOKENS = REGISTRY.register(Histogram(
+    "llm_prompt_tokens", "Prompt tokens per chat model call.", ["role"], buckets=TOKEN_BUCKETS))
+LLM_COMPLETION_TOKENS = REGISTRY.register(Histogram(
+    "llm_completion_tokens", "Completion tokens per chat model call.", ["role"], buckets=TOKEN_BUCKETS))
+LLM_CACHED_TOKENS = REGISTRY.register(Counter(
+    "llm_cached_prompt_tokens_total", "Prompt tokens served from the provider prompt cache.", ["role"]))
+LLM_CACHE_HITS = REGISTRY.register(Counter(
+    "llm_prompt_cache_hits_total", "Chat model calls with at least one cached prompt token.", ["role"]))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "llm_request_errors_total", "Chat model calls that raised.", ["role"]))
+DB_QUERY_SECONDS = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "Wall time of results database queries.", ["query"]))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+def instrument_node(name: str, func: Callable) -> Callable:
+    """
+    Wrap an async LangGraph node function so that its wall time is recorded.
+
+    functools.wraps keeps the signature and annotations LangGraph inspects
+    (config parameter, Command[...] return type).
+
+    Args:
+        name (str): The node name, used as the metric label.
+        func (Callable): The node coroutine function.
+
+    Returns:
+        Callable: The instrumented node function.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            NODE_SECONDS.observe(time.perf_counter() - start, node=name, status=status)
+    return wrapper
+
+
+def timed_query(query: str) -> Callable:
+    """Decorator recording the wall time of an async DB query function under the given label."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with DB_QUERY_SECONDS.time(query=query):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class FirstTokenTimer(AsyncCallbackHandler):
+    """Callback handler recording when the first streamed token of a call arrives."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+
+    async def on_llm_new_token(self, token: str, **kwargs) -> None:
+        if self.first_token is None:
+            self.first_token = time.perf_counter() - self.start
+
+
+def record_llm_response(role: str, response) -> None:
+    """Record token usage and prompt cache hits reported in a response's usage metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    LLM_PROMPT_TOKENS.observe(usage.get("input_tokens", 0), role=role)
+    LLM_COMPLETION_TOKENS.observe(usage.get("output_tokens", 0), role=role)
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    if cached:
+        LLM_CACHED_TOKENS.inc(cached, role=role)
+        LLM_CACHE_HITS.inc(role=role)
@@ -0,0 +1,97 @@
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Profile every wrapped run; single chat runs can also be profiled with the /profile prefix
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "./profiles")
+# Also record allocations with tracemalloc (slows the run down noticeably)
+PROFILE_MEMORY = os.environ.get("PROFILE_MEMORY", "true").lower() == "true"
+PROFILE_TRACEMALLOC_FRAMES = int(os.environ.get("PROFILE_TRACEMALLOC_FRAMES", "8"))
+
+PROFILE_PREFIX = "/profile "
+
+# cProfile and tracemalloc are process-wide, only one run is profiled at a time
+_active = threading.Lock()
+_sequence = itertools.count()
+
+
+def strip_profile_prefix(content: str) -> tuple[str, bool]:
+    """
+    Split the /profile switch off a chat message.
+
+    Args:
+        content (str): The message content, e.g. "/profile /report all".
+
+    Returns:
+        tuple: The content without the prefix, and whether it was present.
+    """
+    if content.startswith(PROFILE_PREFIX):
+        return content[len(PROFILE_PREFIX):].lstrip(), True
+    return content, False
+
+
+@contextmanager
+def profile_run(label: str, enabled: Optional[bool] = None, output_dir: Optional[str] = None) -> Iterator[Optional[str]]:
+    """
+    Profile the enclosed block with cProfile and, if PROFILE_MEMORY is set, tracemalloc.
+
+    Writes <run>.pstats, <run>.tracemalloc (a tracemalloc snapshot taken at the end of
+    the block) and <run>.json (label, duration, peak traced memory) to the output
+    directory. cProfile sees the whole thread, so coroutines of other requests running
+    on the same event loop are included in the profile.
+
+    Args:
+        label (str): Name of the profiled operation, part of the file names.
+        enabled (bool, optional): Profile this run; defaults to PROFILE_ENABLED.
+        output_dir (str, optional): Defaults to PROFILE_DIR.
+
+    Yields:
+        str: The path prefix of the run files, or None when the run is not profiled.
+    """
+    if enabled is None:
+        enabled = PROFILE_ENABLED
+    if not enabled:
+        yield None
+        return
+    if not _active.acquire(blocking=False):
+        print(f"Profiling of {label} skipped, another run is being profiled")
+        yield None
+        return
+
+    output_dir = output_dir or PROFILE_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}-{label}"
+    prefix = os.path.join(output_dir, run_id)
+
+    trace_memory = PROFILE_MEMORY and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    started = time.time()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield prefix
+    finally:
+        profiler.disable()
+        seconds = time.perf_counter() - start
+        peak = None
+        try:
+            profiler.dump_stats(f"{prefix}.pstats")
+            if trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.take_snapshot().dump(f"{prefix}.tracemalloc")
+            with open(f"{prefix}.json", "w", encoding="utf-8") as file:
+                json.dump({"label": label, "started": started, "seconds": seconds, "peak_bytes": peak}, file)
+            print(f"Profile of {label} ({seconds:.2f}s) written to {prefix}.*")
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+            _active.release()
@@ -0,0 +1,60 @@
+import asyncio
+import os
+from typing import Optional
+
+STREAM_FLUSH_INTERVAL_MS = int(os.environ.get("STREAM_FLUSH_INTERVAL_MS", "40"))
+STREAM_FLUSH_CHARS = int(os.environ.get("STREAM_FLUSH_CHARS", "256"))
+
+
+class TokenStreamBuffer:
+    """
+    Coalesce streamed tokens before they are emitted to a Chainlit message.
+
+    Buffered text is flushed when it reaches ``max_chars`` characters, ``interval_ms``
+    after the first buffered token, or when flush() is called explicitly (end of a
+    generation, node transitions).
+    """
+
+    def __init__(self, message, interval_ms: int = STREAM_FLUSH_INTERVAL_MS, max_chars: int = STREAM_FLUSH_CHARS):
+        self.message = message
+        self.interval = interval_ms / 1000
+        self.max_chars = max_chars
+        self.tokens = 0
+        self.emits = 0
+        self._parts: list[str] = []
+        self._size = 0
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def add(self, token: str) -> None:
+        if not token:
+            return
+        self._parts.append(token)
+        self._size += len(token)
+        self.tokens += 1
+        if self._size >= self.max_chars:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        # Clear the handle first so flush() does not cancel the running timer
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts.clear()
+            self._size = 0
+            await self.message.stream_token(text)
+            self.emits += 1
+
+    def stats(self) -> dict:
+        return {"tokens": self.tokens, "emits": self.emits}
@@ -1,14 +1,89 @@
 import os
+from functools import lru_cache
 import tiktoken
 from langchain.chat_models import init_chat_model
 from langchain.prompts import PromptTemplate
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from src.utils.llm_gateway import GatedChatModel, get_llm_gateway, PRIORITY_INTERACTIVE
+from src.utils.llm_replay import get_replay_cache
+from src.utils.http_client import get_llm_http_client
 
-def load_chat_model():
-    OPENAI_API_BASE = os.environ.get("OPENAI_API_BASE")
-    TEMPERATURE = os.environ.get("TEMPERATURE", "0.1")
-    OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
-    return init_chat_model(OPENAI_MODEL, model_provider="openai", base_url=OPENAI_API_BASE, temperature=float(TEMPERATURE))
+# Model roles, each configurable through LLM_<ROLE>_MODEL / _API_BASE / _TEMPERATURE / _TIMEOUT
+MODEL_ROLES = ("intent", "sql", "scoring", "report", "explanation")
+
+def get_model_config(role: str = None) -> dict:
+    """
+    Resolve the model settings of a role, falling back to the global OPENAI_* settings.
+
+    Args:
+        role (str, optional): One of MODEL_ROLES, or None for the global settings.
+
+    Returns:
+        dict: model, base_url, temperature and timeout.
+    """
+    if role is not None and role not in MODEL_ROLES:
+        raise ValueError(f"Unknown model role '{role}'. Allowed roles are {', '.join(MODEL_ROLES)}.")
+    prefix = f"LLM_{role.upper()}_" if role else None
+
+    def setting(name, global_name, default=None):
+        value = os.environ.get(f"{prefix}{name}") if prefix else None
+        return value if value else os.environ.get(global_name, default)
+
+    timeout = setting("TIMEOUT", "LLM_TIMEOUT")
+    return {
+        "model": setting("MODEL", "OPENAI_MODEL", "gpt-4o-mini"),
+        "base_url": setting("API_BASE", "OPENAI_API_BASE"),
+        "temperature": float(setting("TEMPERATURE", "TEMPERATURE", "0.1")),
+        "timeout": float(timeout) if timeout else None,
+        # Token usage (incl. cached prompt tokens) is only reported on streamed responses when requested
+        "stream_usage": os.environ.get("LLM_STREAM_USAGE", "true").lower() == "true",
+    }
+
+def load_chat_model(role: str = None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Create the chat model of a role, its requests going through the shared LLM gateway
+    and the shared pooled HTTP client (see src.utils.http_client).
+    With LLM_REPLAY_MODE=record or replay, responses are recorded to or served from
+    the replay store (see src.utils.llm_replay).
+
+    Args:
+        role (str, optional): One of MODEL_ROLES, or None for the global settings.
+        priority (int): Queue priority of the model's requests, lower is served first.
+    """
+    config = get_model_config(role)
+    model = init_chat_model(
+        config["model"],
+        model_provider="openai",
+        base_url=config["base_url"],
+        temperature=config["temperature"],
+        timeout=config["timeout"],
+        stream_usage=config["stream_usage"],
+        cache=get_replay_cache(),
+        http_async_client=get_llm_http_client(),
+    )
+    return GatedChatModel(model, get_llm_gateway(), priority, role or "default")
+
+@lru_cache(maxsize=None)
+def get_chat_model(role: str = None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Return the shared chat model of a role, created by load_chat_model on first use,
+    so that importing a module does not load the provider client.
+
+    Args:
+        role (str, optional): One of MODEL_ROLES, or None for the global settings.
+        priority (int): Queue priority of the model's requests, lower is served first.
+    """
+    return load_chat_model(role, priority)
+
+def log_cache_usage(label: str, response) -> None:
+    """Log prompt and provider-side cached prompt tokens reported in the response usage metadata."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+    prompt_tokens = usage.get("input_tokens", 0)
+    ratio = cached / prompt_tokens if prompt_tokens else 0.0
+    print(f"[{label}] prompt tokens: {prompt_tokens}, cached: {cached} ({ratio:.0%}), completion tokens: {usage.get('output_tokens', 0)}")
 
 def messages_token_count(messages, model="gpt-4-turbo"):
     encoding = tiktoken.encoding_for_model(model)
@@ -19,6 +94,15 @@ def messages_token_count(messages, model="gpt-4-turbo"):
         num_tokens += len(encoding.encode(content))
     return num_tokens
 
+def preload_encodings(models=("gpt-4o", "gpt-4-turbo")) -> list[str]:
+    """
+    Load the tiktoken encodings used for token counting, from TIKTOKEN_CACHE_DIR when set.
+
+    Returns:
+        list: Names of the loaded encodings.
+    """
+    return [tiktoken.encoding_for_model(model).name for model in models]
+
 def token_count(text, model_name="gpt-4o"):
     # Initialize the encoder for the specified model
     encoder = tiktoken.encoding_for_model(model_name)
@@ -46,14 +130,30 @@ def read_file_prompt(file_path: str) -> str:
         print(f"Error reading file {file_path}: {e}")
         return ""
 
+@lru_cache(maxsize=None)
+def prompt_template(prompt_path: str, input_variables: tuple = ()) -> PromptTemplate:
+    """
+    Read and compile a prompt file once.
+
+    Args:
+        prompt_path (str): Path of the prompt file.
+        input_variables (tuple): Names of the template variables.
+    """
+    return PromptTemplate(template=read_file_prompt(prompt_path), input_variables=list(input_variables))
+
 def reasoning_prompt(prompt_path: str, **input_vars):
-    prompt_templ = read_file_prompt(prompt_path)
-    prompt = PromptTemplate(
-        template=prompt_templ, input_variables=list(input_vars.keys()),
-    )
+    prompt = prompt_template(prompt_path, tuple(input_vars.keys()))
     message = prompt.format_prompt(**input_vars)
     return message.to_string()
 
+@lru_cache(maxsize=None)
+def static_prompt(prompt_path: str) -> str:
+    """
+    Render a prompt file without input variables once.
+    Static prompts lead the messages so that they form a byte-identical, cacheable prefix.
+    """
+    return reasoning_prompt(prompt_path)
+
 def get_last_k_human_messages(messages, k=1):
     return [message for message in reversed(messages) if isinstance(message, HumanMessage)][:k]
 
@@ -0,0 +1,169 @@
+import asyncio
+import inspect
+import os
+import sqlite3
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional, Union
+
+from src.utils.metrics import REGISTRY, Gauge
+
+# Run the warm-up steps when the server starts; /ready reports ready immediately when disabled
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# Give up on a step after this many seconds, e.g. an unreachable LLM endpoint
+WARMUP_STEP_TIMEOUT = float(os.getenv("WARMUP_STEP_TIMEOUT", "30"))
+
+WarmupStep = Callable[[], Union[None, Awaitable[None]]]
+
+
+class Readiness:
+    """
+    Warm-up state of the app.
+
+    Each step runs once, in order; failed or timed out steps are logged and reported
+    but do not block readiness, so an instance with a slow dependency still serves.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.started: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.steps: dict[str, dict] = {}
+
+    async def run(self, steps: dict[str, WarmupStep], enabled: bool = WARMUP_ENABLED,
+                  timeout: float = WARMUP_STEP_TIMEOUT) -> None:
+        """
+        Run the warm-up steps, then mark the app ready.
+
+        Args:
+            steps (dict): Step name to a function or coroutine function without arguments.
+                Sync steps run in a worker thread.
+            enabled (bool): When False the steps are skipped.
+            timeout (float): Seconds after which a step is abandoned.
+        """
+        self.started = time.time()
+        start = time.perf_counter()
+        for name, step in steps.items() if enabled else ():
+            step_start = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(step):
+                    await asyncio.wait_for(step(), timeout)
+                else:
+                    await asyncio.wait_for(asyncio.to_thread(step), timeout)
+                status, error = "ok", None
+            except asyncio.TimeoutError:
+                status, error = "timeout", f"did not finish in {timeout:g}s"
+            except Exception as e:
+                status, error = "error", repr(e)
+            seconds = time.perf_counter() - step_start
+            self.steps[name] = {"status": status, "seconds": round(seconds, 3)}
+            if error:
+                self.steps[name]["error"] = error
+                print(f"Warm-up step {name} failed after {seconds:.2f}s: {error}")
+            else:
+                print(f"Warm-up step {name} done in {seconds:.2f}s")
+        self.seconds = time.perf_counter() - start
+        self.ready = True
+        print(f"Warm-up finished in {self.seconds:.2f}s, ready")
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "steps": self.steps,
+        }
+
+
+# Warm-up state of this process
+READINESS = Readiness()
+REGISTRY.register(Gauge("app_ready", "1 once the warm-up has finished.", lambda: int(READINESS.ready)))
+
+
+def install_warmup(app, steps: dict[str, WarmupStep], readiness: Readiness = READINESS) -> None:
+    """
+    Run the warm-up in the background once the server has started.
+
+    The FastAPI app's lifespan is wrapped, so the server accepts requests (and answers
+    /ready with 503) while warming up. Reloading the app module replaces the steps
+    instead of wrapping the lifespan again.
+
+    Args:
+        app: The FastAPI app served by Chainlit.
+        steps (dict): Warm-up steps, see Readiness.run.
+        readiness (Readiness): State reported by the readiness route.
+    """
+    app.state.warmup_steps = steps
+    if getattr(app.state, "warmup_installed", False):
+        return
+    app.state.warmup_installed = True
+    original = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan_with_warmup(server_app):
+        async with original(server_app) as state:
+            task = asyncio.create_task(readiness.run(app.state.warmup_steps))
+            try:
+                yield state
+            finally:
+                task.cancel()
+
+    app.router.lifespan_context = lifespan_with_warmup
+
+
+def open_warmup_connection(db_path: str, timeout: float = WARMUP_STEP_TIMEOUT) -> sqlite3.Connection:
+    """
+    Open a read-only connection for warm-up reads in a worker thread.
+
+    A step that times out only stops being awaited; the connection aborts its
+    statements once the timeout has passed, so the thread does not keep reading.
+
+    Args:
+        db_path (str): Path of the database, which must exist.
+        timeout (float): Seconds after which running statements are interrupted.
+
+    Returns:
+        sqlite3.Connection: Connection with the app's SQL functions registered.
+    """
+    from src.db.sqlite_functions import register_sqlite_functions
+
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    register_sqlite_functions(conn)
+    deadline = time.monotonic() + timeout
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+    return conn
+
+
+def touch_indexes(conn: sqlite3.Connection) -> int:
+    """
+    Read every index of the database once, so that the first queries do not wait on disk.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+
+    Returns:
+        int: Number of indexes read.
+    """
+    indexes = conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_autoindex_%'"
+    ).fetchall()
+    for name, table in indexes:
+        conn.execute(f'SELECT COUNT(*) FROM "{table}" INDEXED BY "{name}"').fetchone()
+    return len(indexes)
+
+
+async def open_llm_connection(model) -> None:
+    """
+    Open a connection of the chat model's HTTP client pool by listing the endpoint's models.
+
+    Any HTTP response, including an error status from endpoints without /models, leaves
+    the connection (TLS handshake included) in the pool.
+    """
+    import openai
+
+    client = getattr(model, "root_async_client", None)
+    if client is None:
+        return
+    try:
+        await client.models.list()
+    except openai.APIStatusError:
+        pass
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+from cvss import CVSS3
+
+from src.scan import cvss_vectorized
+from src.scan.cvss_vectorized import all_base_vectors, cvss3_base_scores
+
+
+@pytest.mark.parametrize("prefix", ["CVSS:3.0", "CVSS:3.1"])
+def test_base_scores_match_cvss_library(prefix):
+    vectors = all_base_vectors(prefix)
+    assert len(vectors) == 2592
+    scores = cvss3_base_scores(vectors)
+    expected = [float(CVSS3(vector).scores()[0]) for vector in vectors]
+    mismatches = [(vector, score, want) for vector, score, want in zip(vectors, scores, expected) if score != want]
+    assert mismatches == []
+
+
+def test_invalid_vectors_score_nan():
+    scores = cvss3_base_scores(["CVSS:2.0/AV:N", "CVSS:3.1/AV:N/AC:L", "", None])
+    assert scores.isna().all()
+
+
+def test_duplicate_vectors_are_scored_once(monkeypatch):
+    scored = []
+    original = cvss_vectorized._base_scores_from_metrics
+
+    def counting(metrics):
+        scored.append(len(metrics))
+        return original(metrics)
+
+    monkeypatch.setattr(cvss_vectorized, "_base_scores_from_metrics", counting)
+    high = "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H"
+    low = "CVSS:3.1/AV:P/AC:H/PR:H/UI:R/S:U/C:L/I:N/A:N"
+    vectors = pd.Series([high, low, high, None, low, high], index=list("abcdef"))
+
+    scores = cvss3_base_scores(vectors)
+
+    assert scored == [2]
+    assert list(scores.index) == list("abcdef")
+    assert scores[["a", "c", "f"]].tolist() == [9.8] * 3
+    assert scores["b"] == scores["e"] == float(CVSS3(low).scores()[0])
+    assert pd.isna(scores["d"])
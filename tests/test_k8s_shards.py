@@ -0,0 +1,46 @@
+from src.scan.kubernetes import K8S_CLUSTER_SHARD, k8s_shard_report, merge_k8s_reports
+
+
+def resource(kind, name, namespace=None, omit_namespace=False):
+    item = {"Kind": kind, "Name": name, "Results": []}
+    if not omit_namespace:
+        item["Namespace"] = namespace
+    return item
+
+
+def test_merge_overlapping_shard_reports():
+    namespace_shard = {"ClusterName": "prod", "Resources": [
+        resource("Deployment", "api", "team-a"),
+        resource("ClusterRole", "admin", None),
+    ]}
+    cluster_shard = {"ClusterName": "prod", "Resources": [
+        resource("ClusterRole", "admin", omit_namespace=True),
+        resource("Node", "node-1", ""),
+    ]}
+    stale = {"ClusterName": "prod", "Resources": [
+        resource("Deployment", "api", "team-a"),
+        resource("Node", "node-1", omit_namespace=True),
+        resource("Deployment", "api", "team-b"),
+    ]}
+
+    merged = merge_k8s_reports([namespace_shard, cluster_shard, stale])
+
+    assert merged["ClusterName"] == "prod"
+    keys = [(item.get("Namespace") or "", item["Kind"], item["Name"]) for item in merged["Resources"]]
+    assert sorted(keys) == [
+        ("", "ClusterRole", "admin"),
+        ("", "Node", "node-1"),
+        ("team-a", "Deployment", "api"),
+        ("team-b", "Deployment", "api"),
+    ]
+
+
+def test_shard_report_selects_namespace():
+    report = {"ClusterName": "prod", "Resources": [
+        resource("Deployment", "api", "team-a"),
+        resource("ClusterRole", "admin", None),
+        resource("Node", "node-1", omit_namespace=True),
+    ]}
+
+    assert [item["Name"] for item in k8s_shard_report(report, "team-a")["Resources"]] == ["api"]
+    assert [item["Name"] for item in k8s_shard_report(report, K8S_CLUSTER_SHARD)["Resources"]] == ["admin", "node-1"]
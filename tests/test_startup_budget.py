@@ -0,0 +1,10 @@
+import pytest
+
+from src.bench.startup import DEFAULT_MODULES, STARTUP_BUDGET_MS, fastest_import, forbidden_imports, import_time_ms
+
+
+@pytest.mark.parametrize("module", list(DEFAULT_MODULES))
+def test_startup_budget(module):
+    imports = fastest_import(module, runs=3)
+    assert forbidden_imports(imports, DEFAULT_MODULES[module]) == []
+    assert import_time_ms(module, imports) <= STARTUP_BUDGET_MS